@@ -1,15 +1,61 @@
+import logging
 from kink import di, inject
-from sqlalchemy import Engine
+from sqlalchemy import Engine, inspect
 from sqlmodel import Session, SQLModel, create_engine
 
 from app.settings import Settings
+from app.utils import ImageExecutor
+from app.domains import fulltext
+from app.domains.media import MediaStore
 from app.domains.publisher import Publisher, ZapImoveis
 
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns(engine: Engine):
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            columns = {
+                column["name"] for column in inspector.get_columns(table.name)
+            }
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                connection.exec_driver_sql(
+                    "ALTER TABLE %s ADD COLUMN %s %s"
+                    % (
+                        preparer.quote(table.name),
+                        preparer.quote(column.name),
+                        column.type.compile(engine.dialect),
+                    )
+                )
+
+
+def ensure_indexes(engine: Engine):
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            indexes = {
+                index["name"] for index in inspector.get_indexes(table.name)
+            }
+            for index in table.indexes:
+                if index.name in indexes:
+                    continue
+                logger.info("Building index %s", index.name)
+                index.create(connection)
+
 
 @inject
 def db_setup(settings: Settings) -> Engine:
     engine = create_engine(settings.db_connection_uri, echo=settings.db_echo)
     SQLModel.metadata.create_all(engine)
+    add_missing_columns(engine)
+    ensure_indexes(engine)
+    fulltext.setup(engine)
     return engine
 
 
@@ -25,5 +71,8 @@ def bootstrap_di() -> None:
     di[Engine] = lambda _: db_setup()
     di[Session] = lambda _: db_session()
 
+    di[ImageExecutor] = lambda _: ImageExecutor()
+    di[MediaStore] = lambda _: MediaStore()
+
     di[ZapImoveis] = lambda _: ZapImoveis()
     di.add_alias(Publisher, ZapImoveis)
@@ -1,33 +1,54 @@
+import asyncio
+import re
+from collections import defaultdict
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from time import monotonic
 
 from kink import inject
 from playwright.async_api import (
+    APIRequestContext,
     Browser,
     BrowserContext,
+    BrowserType,
+    Error,
     Page,
+    Playwright,
+    Request,
+    Response,
+    Route,
+    TimeoutError,
     async_playwright,
     Locator,
 )
+from pydantic import BaseModel
 from secrets import choice
-from app.settings import Settings
-from typing import Callable
+from app.domains import throttle
+from app.settings import RoutingSettings, Settings, WaitSettings
+from typing import Callable, Dict, List, Optional, Self
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _browser_type(playwright: Playwright, channel: str) -> BrowserType:
+    match channel:
+        case "chromium" | "chrome":
+            return playwright.chromium
+        case "firefox":
+            return playwright.firefox
+        case _:
+            return playwright.chromium
+
+
 @inject
 @asynccontextmanager
 async def launch_browser(settings: Settings) -> Browser:
     async with async_playwright() as playwright:
-        match settings.browser_channel:
-            case "chromium" | "chrome":
-                browser_type = playwright.chromium
-            case "firefox":
-                browser_type = playwright.firefox
-            case _:
-                browser_type = playwright.chromium
-        browser = await browser_type.launch(
+        browser = await _browser_type(
+            playwright, settings.browser_channel
+        ).launch(
             channel=settings.browser_channel,
             headless=settings.browser_headless,
             args=settings.browser_args,
@@ -52,27 +73,458 @@ async def new_browser_context(settings: Settings) -> BrowserContext:
             await context.close()
 
 
+@asynccontextmanager
+async def readiness(page: Page, wait: WaitSettings, name: str):
+    if wait is None:
+        yield
+        return
+    start_time = datetime.now(UTC)
+
+    def remaining() -> float:
+        elapsed = datetime.now(UTC) - start_time
+        return max(wait.timeout - elapsed.total_seconds() * 1000, 1)
+
+    response = None
+    if wait.response:
+        response = asyncio.ensure_future(
+            page.wait_for_event(
+                "response",
+                predicate=lambda response: re.search(
+                    wait.response, response.url
+                )
+                is not None,
+                timeout=wait.timeout,
+            )
+        )
+        response.add_done_callback(
+            lambda task: task.cancelled() or task.exception()
+        )
+    quiet_since = start_time
+
+    def request_finished(request: Request):
+        nonlocal quiet_since
+        if re.search(wait.response, request.url):
+            quiet_since = datetime.now(UTC)
+
+    async def wait_quiet():
+        while (
+            quiet := (datetime.now(UTC) - quiet_since).total_seconds() * 1000
+        ) < wait.quiet:
+            if remaining() <= 1:
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(min(wait.quiet - quiet, remaining()) / 1000)
+
+    if wait.response and wait.quiet:
+        page.on("requestfinished", request_finished)
+    try:
+        yield
+        try:
+            if wait.load_state:
+                await page.wait_for_load_state(
+                    wait.load_state, timeout=remaining()
+                )
+            if wait.selector:
+                await page.locator(wait.selector).first.wait_for(
+                    state=wait.state, timeout=remaining()
+                )
+            if response:
+                await asyncio.wait_for(response, remaining() / 1000)
+                if wait.quiet:
+                    await wait_quiet()
+            logger.info(
+                "Wait %s ready in %s", name, datetime.now(UTC) - start_time
+            )
+        except (TimeoutError, asyncio.TimeoutError):
+            logger.info(
+                "Wait %s not ready after %s",
+                name,
+                datetime.now(UTC) - start_time,
+            )
+    finally:
+        response and response.cancel()
+        if wait.response and wait.quiet:
+            page.remove_listener("requestfinished", request_finished)
+    if wait.delay:
+        await page.wait_for_timeout(wait.delay)
+
+
+@asynccontextmanager
+async def open_page(
+    context: BrowserContext,
+    url: str,
+    wait_for_timeout: int = 1000,
+    setup: Callable = None,
+    wait: WaitSettings = None,
+) -> Page:
+    page = await context.new_page()
+    try:
+        if setup:
+            try:
+                await setup(page, url)
+            except Exception as ex:
+                logger.warning("An error happning on page setup: %s", str(ex))
+                pass
+        response, latency = None, None
+
+        async def goto():
+            nonlocal response, latency
+            start_time = monotonic()
+            response = await page.goto(url)
+            latency = monotonic() - start_time
+
+        try:
+            if wait:
+                async with readiness(page, wait, "load_page"):
+                    await goto()
+            else:
+                await goto()
+                await page.wait_for_timeout(wait_for_timeout)
+        except TimeoutError:
+            throttle.report(timed_out=True)
+            raise
+        throttle.report(response and response.status, latency=latency)
+        yield page
+    finally:
+        await page.close()
+
+
+@inject
+class BrowserSession:
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._idle_contexts: List[BrowserContext] = []
+        self._navigations: Dict[BrowserContext, int] = {}
+        self._crashed_contexts: set[BrowserContext] = set()
+        self._request_context: Optional[APIRequestContext] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> Self:
+        self._playwright = await async_playwright().start()
+        await self._launch()
+        self._request_context = await _new_request_context(
+            self._playwright, self.settings
+        )
+        return self
+
+    async def close(self):
+        if self._request_context:
+            await self._request_context.dispose()
+            self._request_context = None
+        for context in [*self._navigations.keys()]:
+            await self._close_context(context)
+        if self._browser and self._browser.is_connected():
+            await self._browser.close()
+        if self._playwright:
+            await self._playwright.stop()
+        self._browser, self._playwright = None, None
+
+    async def _launch(self):
+        logger.info("Launching %s browser...", self.settings.browser_channel)
+        self._browser = await _browser_type(
+            self._playwright, self.settings.browser_channel
+        ).launch(
+            channel=self.settings.browser_channel,
+            headless=self.settings.browser_headless,
+            args=self.settings.browser_args,
+        )
+        self._idle_contexts.clear()
+        self._navigations.clear()
+        self._crashed_contexts.clear()
+
+    async def _acquire_context(self) -> BrowserContext:
+        async with self._lock:
+            if not self._browser.is_connected():
+                logger.warning("Browser disconnected, launching a new one")
+                await self._launch()
+            if self._idle_contexts:
+                return self._idle_contexts.pop()
+            context = await self._browser.new_context(
+                no_viewport=self.settings.browser_no_viewport
+            )
+            context.on(
+                "page",
+                lambda page: page.on(
+                    "crash", lambda _: self._crashed_contexts.add(context)
+                ),
+            )
+            self._navigations[context] = 0
+            return context
+
+    async def _release_context(self, context: BrowserContext):
+        if context not in self._navigations:
+            return
+        if context in self._crashed_contexts:
+            logger.warning("Replacing crashed browser context")
+            await self._close_context(context)
+        elif (
+            self._navigations[context]
+            >= self.settings.browser_context_max_navigations
+        ):
+            await self._close_context(context)
+        else:
+            self._idle_contexts.append(context)
+
+    async def _close_context(self, context: BrowserContext):
+        self._navigations.pop(context, None)
+        self._crashed_contexts.discard(context)
+        if context in self._idle_contexts:
+            self._idle_contexts.remove(context)
+        try:
+            await context.close()
+        except Error as ex:
+            logger.warning("Failed to close browser context: %s", str(ex))
+
+    @asynccontextmanager
+    async def context(self) -> BrowserContext:
+        context = await self._acquire_context()
+        try:
+            yield context
+        except Error as ex:
+            if not isinstance(ex, TimeoutError):
+                self._crashed_contexts.add(context)
+            raise ex
+        finally:
+            await self._release_context(context)
+
+    async def fetch(self, url: str) -> "FetchedPage":
+        return await _fetch(self._request_context, url)
+
+    @asynccontextmanager
+    async def load_page(
+        self,
+        url: str,
+        wait_for_timeout: int = 1000,
+        setup: Callable = None,
+        wait: WaitSettings = None,
+    ) -> Page:
+        async with self.context() as context:
+            context: BrowserContext
+            self._navigations[context] = self._navigations[context] + 1
+            async with open_page(
+                context,
+                url,
+                wait_for_timeout=wait_for_timeout,
+                setup=setup,
+                wait=wait,
+            ) as page:
+                yield page
+
+
+class FetchedPage(BaseModel):
+    url: str
+    status: int
+    text: str
+
+
+async def _new_request_context(
+    playwright: Playwright, settings: Settings
+) -> APIRequestContext:
+    return await playwright.request.new_context(
+        user_agent=settings.http_user_agent,
+        extra_http_headers={"Accept-Language": settings.http_accept_language},
+        timeout=settings.http_timeout,
+    )
+
+
+async def _fetch(request_context: APIRequestContext, url: str) -> FetchedPage:
+    start_time = monotonic()
+    response = await request_context.get(url, fail_on_status_code=False)
+    throttle.report(latency=monotonic() - start_time)
+    try:
+        return FetchedPage(
+            url=response.url,
+            status=response.status,
+            text=await response.text(),
+        )
+    finally:
+        await response.dispose()
+
+
+_current_browser_session: ContextVar[Optional[BrowserSession]] = ContextVar(
+    "current_browser_session", default=None
+)
+
+
+@asynccontextmanager
+async def browser_session() -> BrowserSession:
+    session = _current_browser_session.get()
+    if session:
+        yield session
+        return
+    session = await BrowserSession().start()
+    token = _current_browser_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_browser_session.reset(token)
+        await session.close()
+
+
 @asynccontextmanager
 async def load_page(
-    url: str, wait_for_timeout: int = 1000, setup: Callable = None
+    url: str,
+    wait_for_timeout: int = 1000,
+    setup: Callable = None,
+    wait: WaitSettings = None,
 ) -> Page:
+    session = _current_browser_session.get()
+    if session:
+        async with session.load_page(
+            url, wait_for_timeout=wait_for_timeout, setup=setup, wait=wait
+        ) as page:
+            yield page
+        return
     async with new_browser_context() as context:
         context: BrowserContext
-        page = await context.new_page()
-        try:
-            if setup:
-                try:
-                    await setup(page, url)
-                except Exception as ex:
-                    logger.warning(
-                        "An error happning on page setup: %s", str(ex)
-                    )
-                    pass
-            await page.goto(url)
-            await page.wait_for_timeout(wait_for_timeout)
+        async with open_page(
+            context,
+            url,
+            wait_for_timeout=wait_for_timeout,
+            setup=setup,
+            wait=wait,
+        ) as page:
             yield page
+
+
+@inject
+async def fetch(url: str, settings: Settings) -> FetchedPage:
+    session = _current_browser_session.get()
+    if session:
+        return await session.fetch(url)
+    async with async_playwright() as playwright:
+        request_context = await _new_request_context(playwright, settings)
+        try:
+            return await _fetch(request_context, url)
         finally:
-            await page.close()
+            await request_context.dispose()
+
+
+class RoutingStats:
+
+    def __init__(self) -> None:
+        self.blocked: Dict[str, int] = defaultdict(int)
+        self._received_bytes: Dict[str, int] = defaultdict(int)
+        self._received: Dict[str, int] = defaultdict(int)
+
+    def record_blocked(self, resource_type: str):
+        self.blocked[resource_type] = self.blocked[resource_type] + 1
+
+    def record_received(self, resource_type: str, size: int):
+        self._received[resource_type] = self._received[resource_type] + 1
+        self._received_bytes[resource_type] = (
+            self._received_bytes[resource_type] + size
+        )
+
+    def bytes_saved(self) -> int:
+        return int(
+            sum(
+                count
+                * self._received_bytes[resource_type]
+                / self._received[resource_type]
+                for resource_type, count in self.blocked.items()
+                if self._received[resource_type]
+            )
+        )
+
+    def log_summary(self):
+        if not self.blocked:
+            return
+        logger.info(
+            "Blocked %s request(s) %s, about %.1f MB saved",
+            sum(self.blocked.values()),
+            dict(self.blocked),
+            self.bytes_saved() / 1024**2,
+        )
+
+
+class RequestRouter:
+
+    def __init__(
+        self,
+        routing: RoutingSettings,
+        stats: RoutingStats,
+        allowed_url_patterns: List[str] = [],
+    ) -> None:
+        self.blocked_resource_types = set(routing.blocked_resource_types)
+        self.blocked_url_patterns = [
+            re.compile(pattern) for pattern in routing.blocked_url_patterns
+        ]
+        self.allowed_url_patterns = [
+            re.compile(pattern)
+            for pattern in [
+                *routing.allowed_url_patterns,
+                *allowed_url_patterns,
+            ]
+        ]
+        self.stats = stats
+
+    def blocks(self, request: Request) -> bool:
+        if any(
+            pattern.search(request.url)
+            for pattern in self.allowed_url_patterns
+        ):
+            return False
+        return request.resource_type in self.blocked_resource_types or any(
+            pattern.search(request.url)
+            for pattern in self.blocked_url_patterns
+        )
+
+    async def _route_handler(self, route: Route):
+        if self.blocks(route.request):
+            self.stats.record_blocked(route.request.resource_type)
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    def _response_handler(self, response: Response):
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            self.stats.record_received(
+                response.request.resource_type, int(content_length)
+            )
+
+    async def install(self, page: Page):
+        await page.route("**/*", self._route_handler)
+        page.on("response", self._response_handler)
+
+
+observe_cards_script = """
+({ selector, known, timeout, settle, jitter }) => new Promise((resolve) => {
+    const count = () => document.querySelectorAll(selector).length;
+    const atBottom = () => window.innerHeight + window.scrollY
+        >= document.body.scrollHeight - 1;
+    const cards = document.querySelectorAll(selector);
+    const sentinel = cards[cards.length - 1] || document.body;
+    const delay = () => Math.random() * jitter;
+    let timer = null;
+    const done = (timedOut) => {
+        mutationObserver.disconnect();
+        intersectionObserver.disconnect();
+        clearTimeout(timer);
+        resolve({ count: count(), timedOut });
+    };
+    const mutationObserver = new MutationObserver(() => {
+        if (count() > known) done(false);
+    });
+    const intersectionObserver = new IntersectionObserver((entries) => {
+        if (!entries.some((entry) => entry.isIntersecting)) return;
+        setTimeout(() => {
+            window.scrollTo(0, document.body.scrollHeight);
+            setTimeout(() => atBottom() && done(true), settle);
+        }, delay());
+    });
+    if (count() > known) return done(false);
+    mutationObserver.observe(
+        document.body, { childList: true, subtree: true }
+    );
+    intersectionObserver.observe(sentinel);
+    timer = setTimeout(() => done(true), timeout);
+    setTimeout(() => sentinel.scrollIntoView({ block: "end" }), delay());
+})
+"""
 
 
 class PageHelper:
@@ -123,3 +575,33 @@ class PageHelper:
             await PageHelper.wait_for_timeout(page, pixels_to_scroll)
             if end and await end.is_visible():
                 break
+
+    @staticmethod
+    async def observe_to_end(
+        page: Page,
+        selector: str,
+        end: Locator = None,
+        jitter: int = 0,
+        timeout: int = 5000,
+        settle: int = 1000,
+    ) -> Locator:
+        locator = page.locator(selector)
+        locator_index = 0
+        while True:
+            state = await page.evaluate(
+                observe_cards_script,
+                dict(
+                    selector=selector,
+                    known=locator_index,
+                    timeout=timeout,
+                    settle=settle,
+                    jitter=jitter,
+                ),
+            )
+            for index in range(locator_index, state["count"]):
+                yield locator.nth(index)
+            locator_index = max(locator_index, state["count"])
+            if state["timedOut"] or (end and await end.is_visible()):
+                break
+        for index in range(locator_index, await locator.count()):
+            yield locator.nth(index)
@@ -0,0 +1,50 @@
+from datetime import UTC, datetime
+from kink import inject
+from sqlmodel import Session, delete
+from app.domains.models import CrawlState
+
+publications_stage = "publications"
+
+
+@inject
+def get(publisher: str, stage: str, session: Session) -> CrawlState:
+    with session:
+        return session.get(CrawlState, (publisher, stage))
+
+
+@inject
+def save(
+    publisher: str,
+    stage: str,
+    page_number: int = None,
+    page_url: str = None,
+    cursor_created_at: datetime = None,
+    cursor_url: str = None,
+    completed: bool = None,
+    session: Session = None,
+):
+    values = dict(
+        page_number=page_number,
+        page_url=page_url,
+        cursor_created_at=cursor_created_at,
+        cursor_url=cursor_url,
+        completed=completed,
+    )
+    with session, session.begin():
+        state = session.get(CrawlState, (publisher, stage)) or CrawlState(
+            publisher=publisher, stage=stage
+        )
+        for key, value in values.items():
+            if value is not None:
+                setattr(state, key, value)
+        state.updated_at = datetime.now(UTC)
+        session.add(state)
+
+
+@inject
+def clear(publisher: str, stage: str = None, session: Session = None):
+    with session, session.begin():
+        statement = delete(CrawlState).where(CrawlState.publisher == publisher)
+        if stage:
+            statement = statement.where(CrawlState.stage == stage)
+        session.exec(statement)
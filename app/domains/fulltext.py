@@ -0,0 +1,87 @@
+import logging
+import re
+from sqlalchemy import Engine, Subquery, column, select, table
+from app.domains.models import PropertyPublication
+
+logger = logging.getLogger(__name__)
+
+fulltext_fields = [
+    "address",
+    "broker",
+    "description",
+    "details",
+    "proposal",
+    "publisher",
+    "type",
+]
+
+content_table = PropertyPublication.__tablename__
+fulltext_table = f"{content_table}_fts"
+
+fulltext = table(fulltext_table, column("rowid"), column("rank"))
+
+
+def enabled(engine: Engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def setup(engine: Engine):
+    if not enabled(engine):
+        return
+    fields = ", ".join(fulltext_fields)
+    old_fields = ", ".join(f"old.{field}" for field in fulltext_fields)
+    new_fields = ", ".join(f"new.{field}" for field in fulltext_fields)
+    delete_old = (
+        f"INSERT INTO {fulltext_table}({fulltext_table}, rowid, {fields}) "
+        f"VALUES('delete', old.rowid, {old_fields});"
+    )
+    insert_new = (
+        f"INSERT INTO {fulltext_table}(rowid, {fields}) "
+        f"VALUES(new.rowid, {new_fields});"
+    )
+    with engine.begin() as connection:
+        created = not connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (fulltext_table,),
+        ).first()
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fulltext_table} "
+            f"USING fts5({fields}, content='{content_table}', "
+            "content_rowid='rowid', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fulltext_table}_ai "
+            f"AFTER INSERT ON {content_table} BEGIN {insert_new} END"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fulltext_table}_ad "
+            f"AFTER DELETE ON {content_table} BEGIN {delete_old} END"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fulltext_table}_au "
+            f"AFTER UPDATE OF {fields} ON {content_table} "
+            f"BEGIN {delete_old} {insert_new} END"
+        )
+        if created:
+            logger.info("Building %s full-text index", fulltext_table)
+            connection.exec_driver_sql(
+                f"INSERT INTO {fulltext_table}({fulltext_table}) "
+                "VALUES('rebuild')"
+            )
+
+
+def match_query(like: str) -> str:
+    return " ".join(f'"{term}"*' for term in re.findall(r"\w+", like or ""))
+
+
+def ranked(like: str, engine: Engine) -> Subquery:
+    query = match_query(like)
+    if not enabled(engine) or not query:
+        return None
+    return (
+        select(fulltext.c.rowid, fulltext.c.rank)
+        .where(column(fulltext_table).op("MATCH")(query))
+        .select_from(fulltext)
+        .subquery()
+    )
@@ -0,0 +1,70 @@
+import os
+import re
+from hashlib import sha256
+from pathlib import Path
+from uuid import uuid4
+from kink import inject
+from app.settings import Settings
+from app.utils import resize_image
+
+media_fields = ["picture", "printscreen"]
+
+
+@inject
+class MediaStore:
+
+    def __init__(self, settings: Settings) -> None:
+        self.root = Path(settings.media_path).resolve()
+        self.thumbnail_sizes = settings.thumbnail_sizes
+
+    def _sharded(self, root: Path, media_hash: str) -> Path:
+        if not re.fullmatch(r"[0-9a-f]{64}", media_hash or ""):
+            raise ValueError(f"Invalid media hash: {media_hash}")
+        return root / media_hash[:2] / media_hash[2:4] / media_hash
+
+    def _write(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f"{path.name}.{uuid4().hex}.tmp")
+        temporary_path.write_bytes(data)
+        os.replace(temporary_path, path)
+
+    def path(self, media_hash: str) -> Path:
+        return self._sharded(self.root, media_hash)
+
+    def thumbnail_path(self, media_hash: str, size: str) -> Path:
+        if size not in self.thumbnail_sizes:
+            raise ValueError(f"Invalid thumbnail size: {size}")
+        return self._sharded(self.root / "thumbnails" / size, media_hash)
+
+    def put(self, data: bytes) -> str:
+        media_hash = sha256(data).hexdigest()
+        path = self.path(media_hash)
+        if not path.exists():
+            self._write(path, data)
+        return media_hash
+
+    def thumbnail(self, media_hash: str, size: str) -> Path:
+        path = self.thumbnail_path(media_hash, size)
+        if path.exists():
+            return path
+        source = self.path(media_hash)
+        if not source.exists():
+            return None
+        data = resize_image(source.read_bytes(), self.thumbnail_sizes[size])
+        if data is None:
+            return None
+        self._write(path, data)
+        return path
+
+    def store(self, data: dict) -> dict:
+        for key in media_fields:
+            if data.get(key) is not None:
+                data = {
+                    **{
+                        field: value
+                        for field, value in data.items()
+                        if field != key
+                    },
+                    f"{key}_hash": self.put(data[key]),
+                }
+        return data
@@ -1,8 +1,8 @@
 from datetime import UTC, datetime
 from enum import StrEnum, auto
-from typing import Optional
+from typing import Dict, Optional
 
-from sqlmodel import Field, SQLModel
+from sqlmodel import JSON, Column, Field, Index, SQLModel
 
 
 class ProposalType(StrEnum):
@@ -20,6 +20,39 @@ class PropertyType(StrEnum):
 
 
 class PropertyPublication(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_propertypublication_publisher_created_at",
+            "publisher",
+            "created_at",
+            "url",
+        ),
+        Index(
+            "ix_propertypublication_publisher_to_inspect_updated_at",
+            "publisher",
+            "to_inspect",
+            "updated_at",
+        ),
+        Index("ix_propertypublication_created_at", "created_at"),
+        Index("ix_propertypublication_updated_at", "updated_at"),
+        Index(
+            "ix_propertypublication_publication_created_at",
+            "publication_created_at",
+        ),
+        Index(
+            "ix_propertypublication_publication_updated_at",
+            "publication_updated_at",
+        ),
+        Index("ix_propertypublication_square_meter", "square_meter"),
+        Index("ix_propertypublication_bedrooms", "bedrooms"),
+        Index("ix_propertypublication_bathrooms", "bathrooms"),
+        Index("ix_propertypublication_floor", "floor"),
+        Index("ix_propertypublication_buy_price", "buy_price"),
+        Index("ix_propertypublication_rent_price", "rent_price"),
+        Index("ix_propertypublication_iptu_tax", "iptu_tax"),
+        Index("ix_propertypublication_condominium_fee", "condominium_fee"),
+    )
+
     url: str = Field(primary_key=True)
     search_url: Optional[str] = None
     publication_created_at: Optional[datetime] = None
@@ -28,6 +61,8 @@ class PropertyPublication(SQLModel, table=True):
     details: Optional[str] = None
     printscreen: Optional[bytes] = None
     picture: Optional[bytes] = None
+    printscreen_hash: Optional[str] = None
+    picture_hash: Optional[str] = None
     address: Optional[str] = None
     broker: Optional[str] = None
     publisher: Optional[str] = None
@@ -53,3 +88,32 @@ class PropertyPublication(SQLModel, table=True):
     deleted: Optional[bool] = False
     hidden: Optional[bool] = False
     favorited: Optional[bool] = False
+
+
+class SearchWatermark(SQLModel, table=True):
+    publisher: str = Field(primary_key=True)
+    searcher: str = Field(primary_key=True)
+    search_url: str = Field(primary_key=True)
+    urls: Dict[str, dict] = Field(default={}, sa_column=Column(JSON))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+
+class CrawlState(SQLModel, table=True):
+    publisher: str = Field(primary_key=True)
+    stage: str = Field(primary_key=True)
+    page_number: Optional[int] = None
+    page_url: Optional[str] = None
+    cursor_created_at: Optional[datetime] = None
+    cursor_url: Optional[str] = None
+    completed: bool = False
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+
+class InspectionSchedule(SQLModel, table=True):
+    url: str = Field(primary_key=True)
+    publisher: Optional[str] = None
+    priority: float = 0
+    next_due_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    change_count: int = 0
+    card_changed: bool = False
+    inspected_at: Optional[datetime] = None
@@ -1,67 +1,351 @@
-from typing import List, Tuple, Optional, Literal
+import asyncio
+import logging
+from collections import defaultdict
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Self,
+    Tuple,
+    get_args,
+)
 from kink import inject
+from sqlalchemy import Engine, literal_column
+from sqlalchemy.orm import defer
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Session, select, desc, asc, func, or_, col, and_
 from datetime import UTC, datetime, timedelta
-from app.domains.models import PropertyPublication
+from app.domains import fulltext, scheduler
+from app.domains.media import MediaStore, media_fields
+from app.domains.models import PropertyPublication, SearchWatermark
+from app.settings import Settings
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
+
+def _save(data: dict, session: Session) -> List[str]:
+    model = session.get(PropertyPublication, data.get("url"))
+    changes = scheduler.changed_fields(model, data)
+    if model:
+        for key in PropertyPublication.model_fields.keys():
+            if data.get(key) is not None and data.get(key) != getattr(
+                model, key
+            ):
+                setattr(model, key, data.get(key))
+        model.updated_at = datetime.now(UTC)
+        session.add(model)
+    else:
+        session.add(PropertyPublication(**data))
+    return changes
+
+
+@inject
+def save(data: dict, session: Session, media_store: MediaStore):
+    data = media_store.store(data)
+    with session, session.begin():
+        changes = _save(data, session)
+        if data.get("to_inspect") is False and not data.get("deleted"):
+            scheduler.track(session, {data["url"]: changes}, inspected=True)
+
+
+upsert_dialects = dict(sqlite=sqlite_insert, postgresql=postgresql_insert)
+
 
 @inject
-def save(data: dict, session: Session):
+def save_all(data_list: List[dict], session: Session, media_store: MediaStore):
+    merged: Dict[str, dict] = {}
+    for data in data_list:
+        if data.get("url") is None:
+            logger.warning("Skipping publication without URL: %s", data)
+            continue
+        merged.setdefault(data["url"], {}).update(
+            {
+                key: value
+                for key, value in media_store.store(data).items()
+                if value is not None
+                and key in PropertyPublication.model_fields
+            }
+        )
+    if not merged:
+        return
     with session, session.begin():
-        model = session.get(PropertyPublication, data.get("url"))
-        if model:
-            for key in PropertyPublication.model_fields.keys():
-                if data.get(key) is not None and data.get(key) != getattr(
-                    model, key
-                ):
-                    setattr(model, key, data.get(key))
-            model.updated_at = datetime.now(UTC)
-            session.add(model)
-        else:
-            session.add(PropertyPublication(**data))
+        insert = upsert_dialects.get(session.get_bind().dialect.name)
+        if not insert:
+            changes = {
+                url: _save(data, session) for url, data in merged.items()
+            }
+            scheduler.track(session, changes, inspected=False)
+            return
+        changes = {
+            row.url: scheduler.changed_fields(row, merged[row.url])
+            for row in session.exec(
+                select(
+                    PropertyPublication.url,
+                    *[
+                        getattr(PropertyPublication, field)
+                        for field in scheduler.tracked_fields
+                    ],
+                ).where(col(PropertyPublication.url).in_(merged.keys()))
+            )
+        }
+        grouped: Dict[Tuple[str, ...], List[dict]] = defaultdict(list)
+        for data in merged.values():
+            grouped[tuple(sorted(data.keys()))].append(data)
+        for keys, group in grouped.items():
+            statement = insert(PropertyPublication).values(
+                [PropertyPublication(**data).model_dump() for data in group]
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=[PropertyPublication.url],
+                set_={
+                    **{
+                        key: statement.excluded[key]
+                        for key in keys
+                        if key != "url"
+                    },
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+            session.execute(statement)
+        scheduler.track(
+            session,
+            {url: changes.get(url, []) for url in merged.keys()},
+            inspected=False,
+        )
+
+
+@inject
+class PublicationsBuffer:
+
+    def __init__(
+        self,
+        settings: Settings,
+        on_flush: Callable[[List[dict]], Awaitable] = None,
+    ) -> None:
+        self.size = settings.db_write_batch_size
+        self.interval = settings.db_write_flush_interval
+        self.on_flush = on_flush
+        self._items: List[dict] = []
+        self._flush_task: asyncio.Task = None
+
+    async def add(self, data: dict):
+        self._items.append(data)
+        if len(self._items) >= self.size:
+            await self.flush()
+
+    async def flush(self):
+        items, self._items = self._items, []
+        if not items:
+            return
+        try:
+            save_all(items)
+        except Exception:
+            self._items = items + self._items
+            raise
+        if self.on_flush:
+            await self.on_flush(items)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as ex:
+                logger.error("Failed to flush publications: %s", ex)
+
+    async def __aenter__(self) -> Self:
+        self._flush_task = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, *args):
+        self._flush_task.cancel()
+        try:
+            await self._flush_task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self.flush()
 
 
 @inject
-def urls_by_publisher(
+def search_watermark(
+    publisher: str, searcher: str, search_url: str, session: Session
+) -> Dict[str, dict]:
+    with session:
+        watermark = session.get(
+            SearchWatermark, (publisher, searcher, search_url)
+        )
+        return dict(watermark.urls) if watermark else {}
+
+
+@inject
+def save_search_watermark(
+    publisher: str,
+    searcher: str,
+    search_url: str,
+    urls: Dict[str, dict],
+    session: Session,
+):
+    with session, session.begin():
+        watermark = session.get(
+            SearchWatermark, (publisher, searcher, search_url)
+        ) or SearchWatermark(
+            publisher=publisher, searcher=searcher, search_url=search_url
+        )
+        watermark.urls = urls
+        watermark.updated_at = datetime.now(UTC)
+        session.add(watermark)
+
+
+class IncrementalSearch:
+
+    def __init__(
+        self,
+        publisher: str,
+        searcher: str,
+        search_url: str,
+        stop_after: int,
+        size: int = 500,
+    ) -> None:
+        self.publisher = publisher
+        self.searcher = searcher
+        self.search_url = search_url
+        self.stop_after = stop_after
+        self.size = size
+        self.known = (
+            search_watermark(publisher, searcher, search_url)
+            if stop_after
+            else {}
+        )
+        self.urls: Dict[str, dict] = {}
+        self.streak = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(self.stop_after) and self.streak >= self.stop_after
+
+    def is_known(self, url: str, fingerprint: str) -> bool:
+        entry = self.known.get(url) or {}
+        known = entry.get("fingerprint") == fingerprint
+        self.streak = self.streak + 1 if known else 0
+        self.urls.setdefault(
+            url,
+            {
+                "fingerprint": fingerprint,
+                "seen_at": (
+                    entry.get("seen_at")
+                    if known
+                    else datetime.now(UTC).isoformat()
+                ),
+            },
+        )
+        return known
+
+    def save(self):
+        if not self.stop_after:
+            return
+        urls = {
+            **self.urls,
+            **{
+                url: entry
+                for url, entry in self.known.items()
+                if url not in self.urls
+            },
+        }
+        save_search_watermark(
+            self.publisher,
+            self.searcher,
+            self.search_url,
+            dict(list(urls.items())[: self.size]),
+        )
+
+
+def _urls_by_publisher_conditionals(
+    publisher: str, look_back: timedelta, only_inspect: bool
+) -> list:
+    return [
+        PropertyPublication.publisher == publisher,
+        (
+            or_(
+                PropertyPublication.updated_at > datetime.now(UTC) - look_back,
+                col(PropertyPublication.broker).is_(None),
+            )
+            if look_back and only_inspect
+            else True
+        ),
+        (
+            col(PropertyPublication.to_inspect).is_(True)
+            if only_inspect
+            else True
+        ),
+        col(PropertyPublication.deleted).is_not(True),
+    ]
+
+
+@inject
+def count_urls_by_publisher(
     publisher: str,
-    slice: tuple = None,
     look_back: timedelta = timedelta(hours=2),
     only_inspect: bool = False,
     session: Session = None,
-) -> Tuple[int, List[str]]:
+) -> int:
     with session:
-        conditionals = [
-            PropertyPublication.publisher == publisher,
-            (
-                or_(
-                    PropertyPublication.updated_at
-                    > datetime.now(UTC) - look_back,
-                    col(PropertyPublication.broker).is_(None),
+        return session.exec(
+            select(func.count(PropertyPublication.url)).where(
+                *_urls_by_publisher_conditionals(
+                    publisher, look_back, only_inspect
                 )
-                if look_back and only_inspect
-                else True
-            ),
-            (
-                col(PropertyPublication.to_inspect).is_(True)
-                if only_inspect
-                else True
-            ),
-            col(PropertyPublication.deleted).is_not(True),
-        ]
-        statement_count = select(func.count(PropertyPublication.url)).where(
-            *conditionals
-        )
+            )
+        ).one()
+
+
+@inject
+def iter_urls_by_publisher(
+    publisher: str,
+    batch_size: int = 100,
+    look_back: timedelta = timedelta(hours=2),
+    only_inspect: bool = False,
+    after: Tuple[datetime, str] = None,
+    cursors: bool = False,
+    session: Session = None,
+) -> Iterator[str | Tuple[datetime, str]]:
+    conditionals = _urls_by_publisher_conditionals(
+        publisher, look_back, only_inspect
+    )
+    while True:
         statement_url = (
-            select(PropertyPublication.url)
+            select(PropertyPublication.created_at, PropertyPublication.url)
             .where(*conditionals)
-            .order_by(desc(PropertyPublication.created_at))
-        )
-        if slice:
-            statement_url = statement_url.slice(*slice)
-        return session.exec(statement_count).one(), list(
-            session.exec(statement_url).all()
+            .order_by(
+                desc(PropertyPublication.created_at),
+                desc(PropertyPublication.url),
+            )
+            .limit(batch_size)
+            .execution_options(yield_per=batch_size)
         )
+        if after:
+            statement_url = statement_url.where(
+                or_(
+                    PropertyPublication.created_at < after[0],
+                    and_(
+                        PropertyPublication.created_at == after[0],
+                        PropertyPublication.url < after[1],
+                    ),
+                )
+            )
+        with session:
+            rows = [tuple(row) for row in session.exec(statement_url)]
+        for created_at, url in rows:
+            yield (created_at, url) if cursors else url
+        if len(rows) < batch_size:
+            return
+        after = rows[-1]
 
 
 @inject
@@ -71,14 +355,86 @@ def already_have_photo(
 ) -> bool:
     with session:
         return session.exec(
-            select(col(PropertyPublication.picture).is_not(None)).where(
-                PropertyPublication.url == url
-            )
+            select(
+                or_(
+                    col(PropertyPublication.picture_hash).is_not(None),
+                    col(PropertyPublication.picture).is_not(None),
+                )
+            ).where(PropertyPublication.url == url)
         ).first()
 
 
+def _move_media(model: PropertyPublication, media_store: MediaStore):
+    for key in media_fields:
+        if getattr(model, key) is not None:
+            setattr(model, f"{key}_hash", media_store.put(getattr(model, key)))
+            setattr(model, key, None)
+
+
+@inject
+def migrate_media(
+    batch_size: int = 100,
+    session: Session = None,
+    media_store: MediaStore = None,
+) -> int:
+    moved = 0
+    while True:
+        with session, session.begin():
+            models = session.exec(
+                select(PropertyPublication)
+                .where(
+                    or_(
+                        *[
+                            col(getattr(PropertyPublication, key)).is_not(None)
+                            for key in media_fields
+                        ]
+                    )
+                )
+                .limit(batch_size)
+            ).all()
+            for model in models:
+                _move_media(model, media_store)
+                session.add(model)
+        moved = moved + len(models)
+        if models:
+            logger.info("Moved media of %s publication(s)", moved)
+        if len(models) < batch_size:
+            return moved
+
+
+@inject
+def vacuum(engine: Engine):
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as connection:
+        connection.exec_driver_sql("VACUUM")
+
+
+search_deferred_fields = ["printscreen", "picture", "description", "details"]
+
+
+SortableField = Literal[
+    "created_at",
+    "updated_at",
+    "publication_created_at",
+    "publication_updated_at",
+    "square_meter",
+    "bedrooms",
+    "bathrooms",
+    "floor",
+    "buy_price",
+    "rent_price",
+    "iptu_tax",
+    "condominium_fee",
+    "url",
+]
+sortable_fields: List[str] = list(get_args(SortableField))
+
+
 class SearchOrderBy(BaseModel):
-    field: Optional[str]
+    field: Optional[SortableField]
     direction: Optional[Literal["ASC", "DESC"]]
 
 
@@ -137,11 +493,14 @@ def search(
     conditions: ConditionsSearch = None,
     ordering: list[SearchOrderBy] = None,
     slice: tuple = None,
+    projection: bool = False,
+    include: List[str] = None,
     session: Session = None,
 ) -> Tuple[int, List[PropertyPublication]]:
     with session:
         conditionals = []
-        if like:
+        ranked = fulltext.ranked(like, session.get_bind()) if like else None
+        if like and ranked is None:
             like = f"%{like}%"
             conditionals.append(
                 or_(
@@ -227,6 +586,18 @@ def search(
             .where(*conditionals)
             .order_by(desc(PropertyPublication.created_at))
         )
+        if ranked is not None:
+            rowid = literal_column(
+                f"{PropertyPublication.__tablename__}.rowid"
+            )
+            statement_count = statement_count.join(
+                ranked, ranked.c.rowid == rowid
+            )
+            statement_url = (
+                statement_url.join(ranked, ranked.c.rowid == rowid)
+                .order_by(None)
+                .order_by(ranked.c.rank, desc(PropertyPublication.created_at))
+            )
 
         _ordering = []
         if ordering:
@@ -242,6 +613,15 @@ def search(
         if _ordering:
             statement_url = statement_url.order_by(None).order_by(*_ordering)
 
+        if projection:
+            statement_url = statement_url.options(
+                *[
+                    defer(getattr(PropertyPublication, field), raiseload=True)
+                    for field in search_deferred_fields
+                    if field not in (include or [])
+                ]
+            )
+
         if slice:
             statement_url = statement_url.slice(*slice)
         return session.exec(statement_count).one(), list(
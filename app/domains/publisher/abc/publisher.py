@@ -1,16 +1,43 @@
+import asyncio
 from abc import ABC, abstractmethod
-from playwright.async_api import Page, Locator, TimeoutError
-from app.domains.browser import load_page
+from playwright.async_api import Error, Page, Locator, TimeoutError
+from app.domains.browser import (
+    RequestRouter,
+    RoutingStats,
+    browser_session,
+    load_page,
+    readiness,
+)
+from app.domains import crawl_state
+from app.domains.throttle import AdaptiveController
+from app.settings import PublisherSettings
 from pydantic import BaseModel
-from typing import Self, TypeVar, Generic, SupportsAbs, Callable
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Self,
+    SupportsAbs,
+    TypeVar,
+)
 import logging
 from datetime import datetime, UTC
 from app.exceptions import HiddenElementError
+from app.utils import log_prefix
 import inspect
-from functools import wraps, partial
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+from functools import cache, wraps, partial
 
 logger = logging.getLogger(__name__)
 
+current_searcher: ContextVar[str] = ContextVar(
+    "current_searcher", default=None
+)
+
 
 class Searcher(ABC):
 
@@ -23,20 +50,70 @@ class Publisher(ABC):
 
     name: str
     website: str
+    publisher_settings: PublisherSettings
     searcherTypes: type[Searcher] = set()
+    routing_stats: RoutingStats = None
+    _discovered_urls: asyncio.Queue = None
+    _throttle: AdaptiveController = None
+    _background_tasks: set[asyncio.Task] = None
+    _processing: bool = False
 
-    async def _search_process(self) -> Self:
-        search_process_start_time = datetime.now(UTC)
-        logger.info("Processing search on %s (%s)", self.name, self.website)
-        for searcherType in self.searcherTypes:
+    def run_in_background(self, coroutine: Awaitable):
+        if self._background_tasks is None:
+            self._background_tasks = set()
+        task = asyncio.create_task(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _wait_background_tasks(self):
+        while self._background_tasks:
+            for result in await asyncio.gather(
+                *self._background_tasks, return_exceptions=True
+            ):
+                if isinstance(result, Exception):
+                    logger.error("Background task failed: %s", result)
+
+    def _stages_completed(self, *stages: str):
+        if self._processing:
+            return
+        for stage in stages:
+            crawl_state.clear(self.name, stage)
+
+    @asynccontextmanager
+    async def _routing_report(self):
+        if self.routing_stats is not None:
+            yield
+            return
+        self.routing_stats = RoutingStats()
+        try:
+            yield
+        finally:
+            self.routing_stats.log_summary()
+            self.routing_stats = None
+
+    async def _run_searcher(self, searcherType: type[Searcher]):
+        token = log_prefix.set(
+            " / ".join(filter(None, [log_prefix.get(), searcherType.__name__]))
+        )
+        searcher_token = current_searcher.set(searcherType.__name__)
+        try:
+            if not self.publisher_settings.resume:
+                crawl_state.clear(self.name, searcherType.__name__)
+            elif (
+                state := crawl_state.get(self.name, searcherType.__name__)
+            ) and state.completed:
+                logger.info("Skipping completed %s", searcherType.__name__)
+                return
             async with load_page(
                 self.website,
                 setup=partial(
                     self.setup_page, self.inspect_search_results_page.__name__
                 ),
+                wait=self.publisher_settings.waits.get(
+                    self.inspect_search_results_page.__name__
+                ),
             ) as page:
                 page: Page
-                searcherType: type[Searcher]
                 try:
                     browser_context = page.context
                     logger.info("Running %s...", searcherType.__name__)
@@ -50,6 +127,9 @@ class Publisher(ABC):
                         "Inspect search results completed (elapsed time %s)",
                         datetime.now(UTC) - inspecting_start_time,
                     )
+                    crawl_state.save(
+                        self.name, searcherType.__name__, completed=True
+                    )
                 except Exception as ex:
                     if len(browser_context.pages) > 0:
                         logger.error(
@@ -61,66 +141,293 @@ class Publisher(ABC):
                             ],
                         )
                     raise ex
+        finally:
+            current_searcher.reset(searcher_token)
+            log_prefix.reset(token)
+
+    async def _search_process(self) -> Self:
+        search_process_start_time = datetime.now(UTC)
+        logger.info("Processing search on %s (%s)", self.name, self.website)
+        async with browser_session(), self._routing_report():
+            if self.publisher_settings.parallel_search:
+                async with asyncio.TaskGroup() as task_group:
+                    for searcherType in self.searcherTypes:
+                        task_group.create_task(
+                            self._run_searcher(searcherType)
+                        )
+            else:
+                for searcherType in self.searcherTypes:
+                    await self._run_searcher(searcherType)
+        self._stages_completed(
+            *[searcherType.__name__ for searcherType in self.searcherTypes]
+        )
         logger.info(
             "Search process completed (elapsed time %s)",
             datetime.now(UTC) - search_process_start_time,
         )
 
-    async def _publications_processs(self) -> Self:
-        publications_process_start_time = datetime.now(UTC)
-        urls_count = 0
-        async for publication_url in self.query_publication_urls():
+    def _throttle_slot(self):
+        return self._throttle.slot() if self._throttle else nullcontext()
+
+    async def _inspect_publication_http(self, publication_url: str) -> bool:
+        try:
+            async with self._throttle_slot():
+                if not await self.inspect_publication_http(publication_url):
+                    return False
+        except Error as ex:
+            logger.warning(
+                "HTTP fetch failed, falling back to browser: %s", str(ex)
+            )
+            return False
+        self._urls_count = self._urls_count + 1
+        logger.info(
+            "Processed publications page %s over HTTP: %s",
+            self._urls_count,
+            publication_url,
+        )
+        return True
+
+    async def _inspect_publication(self, publication_url: str) -> bool:
+        if (
+            self.publisher_settings.http_fast_path
+            and await self._inspect_publication_http(publication_url)
+        ):
+            return True
+        try:
+            async with self._throttle_slot(), load_page(
+                publication_url,
+                setup=partial(
+                    self.setup_page, self.inspect_publication_page.__name__
+                ),
+                wait=self.publisher_settings.waits.get(
+                    self.inspect_publication_page.__name__
+                ),
+            ) as page:
+                page: Page
+                try:
+                    self._urls_count = self._urls_count + 1
+                    browser_context = page.context
+                    logger.info(
+                        "Processing publications page %s: %s",
+                        self._urls_count,
+                        publication_url,
+                    )
+                    await self.inspect_publication_page(page, publication_url)
+                except Exception as ex:
+                    if len(browser_context.pages) > 0:
+                        logger.error(
+                            "Something wrong on open page(s): %s",
+                            [
+                                page
+                                for page in browser_context.pages
+                                if not page.is_closed()
+                            ],
+                        )
+                    raise ex
+        except TimeoutError as ex:
+            logger.warning(str(ex))
+            return False
+        return True
+
+    async def _publications_worker(
+        self, queue: asyncio.Queue, pending: set, failed: set, deferred: set
+    ):
+        while (publication_url := await queue.get()) is not None:
+            try:
+                while True:
+                    inspected = await self._inspect_publication(
+                        publication_url
+                    )
+                    if inspected:
+                        failed.discard(publication_url)
+                    else:
+                        failed.add(publication_url)
+                    await self.publication_inspected(publication_url)
+                    if inspected or publication_url not in deferred:
+                        break
+                    deferred.discard(publication_url)
+            finally:
+                deferred.discard(publication_url)
+                pending.discard(publication_url)
+                queue.task_done()
+        queue.task_done()
+
+    async def _publications_producer(
+        self,
+        publication_urls: AsyncIterator[str],
+        queue: asyncio.Queue,
+        pending: set,
+        failed: set,
+        deferred: set,
+        workers: int,
+    ):
+        seen = set()
+        async for publication_url in publication_urls:
             if publication_url is None:
                 continue
-            try:
-                async with load_page(
-                    publication_url,
-                    setup=partial(
-                        self.setup_page, self.inspect_publication_page.__name__
-                    ),
-                ) as page:
-                    page: Page
-                    try:
-                        urls_count = urls_count + 1
-                        browser_context = page.context
-                        logger.info(
-                            "Processing publications page %s: %s",
-                            urls_count,
-                            publication_url,
+            if publication_url in pending:
+                deferred.add(publication_url)
+                continue
+            if publication_url in seen and publication_url not in failed:
+                await self.publication_inspected(publication_url)
+                continue
+            seen.add(publication_url)
+            pending.add(publication_url)
+            await queue.put(publication_url)
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def _publications_processs(
+        self, publication_urls: AsyncIterator[str] = None
+    ) -> Self:
+        publications_process_start_time = datetime.now(UTC)
+        self._urls_count = 0
+        if not self.publisher_settings.resume:
+            crawl_state.clear(self.name, crawl_state.publications_stage)
+        elif (
+            state := crawl_state.get(self.name, crawl_state.publications_stage)
+        ) and state.completed:
+            logger.info("Skipping completed publications process")
+            return
+        publication_urls = publication_urls or self.query_publication_urls()
+        self._throttle = (
+            AdaptiveController(
+                self.publisher_settings.throttle,
+                self.publisher_settings.concurrency,
+            )
+            if self.publisher_settings.throttle.enabled
+            else None
+        )
+        async with browser_session(), self._routing_report():
+            concurrency = (
+                self._throttle.max_concurrency
+                if self._throttle
+                else self.publisher_settings.concurrency
+            )
+            if concurrency > 1:
+                logger.info(
+                    "Processing publications with %s concurrent pages",
+                    concurrency,
+                )
+                queue = asyncio.Queue(maxsize=concurrency)
+                pending, failed, deferred = set(), set(), set()
+                async with asyncio.TaskGroup() as task_group:
+                    for _ in range(concurrency):
+                        task_group.create_task(
+                            self._publications_worker(
+                                queue, pending, failed, deferred
+                            )
                         )
-                        await self.inspect_publication_page(
-                            page, publication_url
+                    task_group.create_task(
+                        self._publications_producer(
+                            publication_urls,
+                            queue,
+                            pending,
+                            failed,
+                            deferred,
+                            concurrency,
                         )
-                    except Exception as ex:
-                        if len(browser_context.pages) > 0:
-                            logger.error(
-                                "Something wrong on open page(s): %s",
-                                [
-                                    page
-                                    for page in browser_context.pages
-                                    if not page.is_closed()
-                                ],
-                            )
-                        raise ex
-            except TimeoutError as ex:
-                logger.warning(str(ex))
+                    )
+            else:
+                seen, failed = set(), set()
+                async for publication_url in publication_urls:
+                    if publication_url is None:
+                        continue
+                    if (
+                        publication_url in seen
+                        and publication_url not in failed
+                    ):
+                        await self.publication_inspected(publication_url)
+                        continue
+                    seen.add(publication_url)
+                    if await self._inspect_publication(publication_url):
+                        failed.discard(publication_url)
+                    else:
+                        failed.add(publication_url)
+                    await self.publication_inspected(publication_url)
+        await self._wait_background_tasks()
+        crawl_state.save(
+            self.name, crawl_state.publications_stage, completed=True
+        )
+        self._stages_completed(crawl_state.publications_stage)
         logger.info(
             "Publications process completed (elapsed time %s)",
             datetime.now(UTC) - publications_process_start_time,
         )
 
+    async def _discovered_publication_urls(self) -> AsyncIterator[str]:
+        while (
+            publication_url := await self._discovered_urls.get()
+        ) is not None:
+            yield publication_url
+        async for publication_url in self.query_publication_urls():
+            yield publication_url
+
+    async def _pipelined_process(self) -> Self:
+        self._discovered_urls = asyncio.Queue()
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                task_group.create_task(
+                    self._publications_processs(
+                        self._discovered_publication_urls()
+                    )
+                )
+                await self._search_process()
+                await self._discovered_urls.put(None)
+        finally:
+            self._discovered_urls = None
+
+    async def publication_found(self, publication_url: str):
+        if self._discovered_urls is not None:
+            await self._discovered_urls.put(publication_url)
+
+    async def publication_inspected(self, publication_url: str):
+        pass
+
+    async def publications_saved(self, saved: List[dict]):
+        for data in saved:
+            data.get("url") and await self.publication_found(data.get("url"))
+
     async def process(self) -> Self:
         processing_start_time = datetime.now(UTC)
-        await self._search_process()
-        await self._publications_processs()
+        self._processing = True
+        try:
+            async with browser_session(), self._routing_report():
+                if self.publisher_settings.pipelined:
+                    await self._pipelined_process()
+                else:
+                    await self._search_process()
+                    await self._publications_processs()
+        finally:
+            self._processing = False
+        crawl_state.clear(self.name)
         logger.info(
             "All processes completed (elapsed time %s)",
             datetime.now(UTC) - processing_start_time,
         )
         return self
 
+    async def route_page(
+        self, load_type: str, page: Page, allowed_url_patterns: list = []
+    ):
+        routing = self.publisher_settings.routing.get(load_type)
+        if not routing:
+            return
+        if self.routing_stats is None:
+            self.routing_stats = RoutingStats()
+        await RequestRouter(
+            routing, self.routing_stats, allowed_url_patterns
+        ).install(page)
+
+    def ready(self, page: Page, name: str):
+        return readiness(page, self.publisher_settings.waits.get(name), name)
+
+    async def wait_until(self, page: Page, name: str):
+        async with self.ready(page, name):
+            pass
+
     async def setup_page(self, load_type: str, page: Page, url: str):
-        pass
+        await self.route_page(load_type, page)
 
     @abstractmethod
     async def inspect_search_results_page(self, page: Page) -> Self:
@@ -134,36 +441,100 @@ class Publisher(ABC):
     ) -> Self:
         pass
 
+    async def inspect_publication_http(self, publication_url: str) -> bool:
+        return False
+
     async def playground(self) -> Self:
         logger.info("Let's play!")
 
 
 T = TypeVar("T", bound=SupportsAbs[Locator])
 
+visibility_probe_script = """
+(root, selectors) => {
+    const isVisible = (element) => {
+        if (!element) return false;
+        const style = getComputedStyle(element);
+        const rect = element.getBoundingClientRect();
+        return style.visibility !== "hidden" && rect.width > 0
+            && rect.height > 0;
+    };
+    return Object.fromEntries(
+        Object.entries(selectors).map(([key, selector]) => {
+            const elements = [
+                ...(root.matches(selector) ? [root] : []),
+                ...root.querySelectorAll(selector),
+            ];
+            return [key, elements.length <= 1 && !isVisible(elements[0])];
+        })
+    );
+}
+"""
 
-def visible_check(locator: Locator, function: Callable):
+
+def visible_check(function: Callable):
     @wraps(function)
-    async def wrapper(*args, **kwargs):
-        if await locator.count() <= 1 and await locator.is_hidden():
+    async def wrapper(self: "VisibleProxy", *args, **kwargs):
+        if self._hidden is None:
+            self._hidden = (
+                await self._locator.count() <= 1
+                and await self._locator.is_hidden()
+            )
+        if self._hidden:
             raise HiddenElementError("Hidden Element")
-        return await function(*args, **kwargs)
+        return await function(self._locator, *args, **kwargs)
 
     return wrapper
 
 
+class VisibleProxy:
+
+    __slots__ = ("_locator", "_hidden")
+
+    def __init__(self, locator: Locator, hidden: bool = None) -> None:
+        self._locator = locator
+        self._hidden = hidden
+
+    def __getattr__(self, key: str):
+        return getattr(self._locator, key)
+
+
+@cache
+def visible_proxy_type(locator_type: type) -> type[VisibleProxy]:
+    return type(
+        f"Visible{locator_type.__name__}",
+        (VisibleProxy,),
+        {
+            key: visible_check(function)
+            for key, function in inspect.getmembers(locator_type)
+            if key not in ["is_hidden", "count"]
+            and not key.startswith("_")
+            and inspect.iscoroutinefunction(function)
+        },
+    )
+
+
 class ModelMapper(Generic[T]):
 
-    def _visible(self, locator: T) -> T:
-        for key, _ in inspect.getmembers(locator):
-            if (
-                key not in ["is_hidden", "count"]
-                and inspect.ismethod(getattr(locator, key))
-                and inspect.iscoroutinefunction(getattr(locator, key))
-            ):
-                setattr(
-                    locator, key, visible_check(locator, getattr(locator, key))
-                )
-        return locator
+    _root: Locator = None
+    _selectors: Dict[str, str] = {}
+    _hidden: Dict[str, bool] = None
+
+    def _visible(self, locator: T, key: str = None) -> T:
+        return visible_proxy_type(type(locator))(
+            locator, (self._hidden or {}).get(key)
+        )
+
+    async def _probe_visibility(self):
+        if self._root is None or not self._selectors:
+            return
+        try:
+            self._hidden = await self._root.evaluate(
+                visibility_probe_script, self._selectors
+            )
+        except Error as ex:
+            logger.warning("Failed to probe visibility: %s", str(ex))
+            self._hidden = None
 
     async def _before(self):
         pass
@@ -175,6 +546,7 @@ class ModelMapper(Generic[T]):
             await self._before()
         except (HiddenElementError, TypeError, TimeoutError, ValueError):
             pass
+        await self._probe_visibility()
 
         for key in model_constructor.model_fields.keys():
             try:
@@ -1,16 +1,30 @@
 from app.domains.publisher import Publisher, Searcher, ModelMapper
-from typing import Self, List
-from playwright.async_api import Page, Locator, Response, Error
-from app.domains.browser import PageHelper
-from app.domains import publications
+from app.domains.publisher.abc.publisher import current_searcher
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Self
+from urllib.parse import urljoin, urlsplit
+from playwright.async_api import (
+    Error,
+    Locator,
+    Page,
+    Response,
+    TimeoutError,
+)
+from app.domains.browser import PageHelper, fetch
+from app.domains import crawl_state, publications, scheduler, throttle
 from app.domains.models import PropertyPublication, PropertyType, ProposalType
+import json
 import re
+from collections import deque
 from enum import auto
 import logging
 from app.settings import Settings
 from datetime import datetime
+from functools import partial
+from hashlib import sha1
+from html.parser import HTMLParser
 from kink import inject
-from app.utils import vertically_concat_images
+from app.utils import ImageExecutor
+from app.exceptions import HiddenElementError
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +36,22 @@ property_type_mapper = dict(
     others=PropertyType.OTHERS,
 )
 
+bot_protection_patterns = [
+    r"cf-chl-|challenge-platform",
+    r"px-captcha|perimeterx",
+    r"<title>\s*(Just a moment|Attention Required|Access Denied)",
+]
+
+
+def is_bot_protection(text: str) -> bool:
+    return any(
+        re.search(pattern, text, re.IGNORECASE)
+        for pattern in bot_protection_patterns
+    )
+
+
+listing_api_url_pattern = r"glue-api\.zapimoveis\.com\.br/v\d+/listings"
+
 proposal_type_mapper = dict(
     venda=ProposalType.SELL,
     aluguel=ProposalType.RENT,
@@ -133,57 +163,108 @@ class RentSearcher(BaseSearcher):
         await page.get_by_text("Buscar Imóveis").click()
 
 
+result_card_selector = "a[itemprop=url]"
+
+result_card_selectors = dict(
+    address=".card__location > *",
+    details=".card__description",
+    square_meter="[itemprop=floorSize]",
+    bedrooms="[itemprop=numberOfRooms]",
+    bathrooms="[itemprop=numberOfBathroomsTotal]",
+    car_spaces="[itemprop=numberOfParkingSpaces]",
+    prices=".listing-price",
+)
+
+extract_result_cards_script = """
+(resultCards, selectors) => {
+    const isVisible = (element) => {
+        if (!element) return false;
+        const style = getComputedStyle(element);
+        const rect = element.getBoundingClientRect();
+        return style.visibility !== "hidden" && rect.width > 0
+            && rect.height > 0;
+    };
+    return resultCards.map((resultCard) => {
+        const data = {
+            url: resultCard.getAttribute("href"),
+            visible: isVisible(resultCard),
+        };
+        for (const [key, selector] of Object.entries(selectors)) {
+            const elements = [...resultCard.querySelectorAll(selector)];
+            data[key] = {
+                visible: elements.length > 1 || isVisible(elements[0]),
+                texts: elements.map((element) => element.textContent),
+            };
+        }
+        return data;
+    });
+}
+"""
+
+
 class ResultCardMapper(ModelMapper[Locator]):
 
+    _selectors = dict(url=":scope", **result_card_selectors)
+
     def __init__(self, locator: Locator) -> None:
         self._result_card = locator
+        self._root = locator
+
+    @staticmethod
+    async def get_dicts(result_cards: Locator) -> List[dict]:
+        return [
+            await ResultCardDataMapper(data).get_dict(PropertyPublication)
+            for data in await result_cards.evaluate_all(
+                extract_result_cards_script, result_card_selectors
+            )
+        ]
+
+    async def _url(self) -> str:
+        return await self._visible(self._result_card, "url").get_attribute(
+            "href"
+        )
+
+    async def _text(self, key: str, check_visible: bool = True) -> str:
+        locator = self._result_card.locator(result_card_selectors[key])
+        if check_visible:
+            locator = self._visible(locator, key)
+        return await locator.text_content()
+
+    async def _all_texts(self, key: str) -> List[str]:
+        return await self._visible(
+            self._result_card.locator(result_card_selectors[key]), key
+        ).all_text_contents()
 
     async def url(self) -> str:
-        return await self._visible(self._result_card).get_attribute("href")
+        return await self._url()
 
     async def address(self) -> str:
-        all_text = (
-            await self._visible(
-                self._result_card.locator(".card__location > *")
-            ).all_text_contents()
-            or []
-        )
+        all_text = await self._all_texts("address") or []
         all_text.reverse()
         return ", ".join(filter(lambda text: len(text), all_text))
 
     async def details(self) -> str:
-        return await self._visible(
-            self._result_card.locator(".card__description")
-        ).text_content()
+        return await self._text("details")
 
     async def square_meter(self) -> int:
         match = re.match(
             r"\d*",
-            await self._result_card.locator(
-                "[itemprop=floorSize]"
-            ).text_content()
-            or "",
+            await self._text("square_meter", check_visible=False) or "",
         ).group()
         return match and int(match)
 
     async def bedrooms(self) -> int:
-        match = await self._visible(
-            self._result_card.locator("[itemprop=numberOfRooms]")
-        ).text_content()
+        match = await self._text("bedrooms")
         match = match and match.split(" - ")[-1]
         return match and int(match)
 
     async def bathrooms(self) -> int:
-        match = await self._visible(
-            self._result_card.locator("[itemprop=numberOfBathroomsTotal]")
-        ).text_content()
+        match = await self._text("bathrooms")
         match = match and match.split(" - ")[-1]
         return match and int(match)
 
     async def car_spaces(self) -> int:
-        match = await self._visible(
-            self._result_card.locator("[itemprop=numberOfParkingSpaces]")
-        ).text_content()
+        match = await self._text("car_spaces")
         match = match and match.split(" - ")[-1]
         return match and int(match)
 
@@ -191,7 +272,7 @@ class ResultCardMapper(ModelMapper[Locator]):
         return ZapImoveis.name
 
     async def proposal(self) -> str:
-        match = re.search(r"imovel/[a-z]+", await self.url())
+        match = re.search(r"imovel/[a-z]+", await self._url())
         match = (
             match[0].replace(r"imovel/", "")
             if match
@@ -202,7 +283,7 @@ class ResultCardMapper(ModelMapper[Locator]):
         )
 
     async def type(self) -> str:
-        match = re.search(r"imovel/[a-z]+-[a-z-]+-", await self.url())
+        match = re.search(r"imovel/[a-z]+-[a-z-]+-", await self._url())
         match = (
             re.sub(r"^imovel/[a-z]+-|-$", "", match[0])
             if match
@@ -214,9 +295,7 @@ class ResultCardMapper(ModelMapper[Locator]):
         )
 
     async def _prices(self) -> str:
-        return await self._visible(
-            self._result_card.locator(".listing-price")
-        ).text_content()
+        return await self._text("prices")
 
     async def condominium_fee(self) -> float:
         match = re.search(r"Cond\. R\$ [0-9.]+", await self._prices())
@@ -258,10 +337,298 @@ class ResultCardMapper(ModelMapper[Locator]):
         return await self._result_card.screenshot(type="jpeg")
 
 
+class ResultCardDataMapper(ResultCardMapper):
+
+    def __init__(self, data: dict) -> None:
+        self._data = data
+
+    async def _url(self) -> str:
+        if not self._data["visible"]:
+            raise HiddenElementError("Hidden Element")
+        return self._data["url"]
+
+    async def _text(self, key: str, check_visible: bool = True) -> str:
+        texts = await self._all_texts(key, check_visible)
+        return texts[0] if texts else None
+
+    async def _all_texts(
+        self, key: str, check_visible: bool = True
+    ) -> List[str]:
+        if check_visible and not self._data[key]["visible"]:
+            raise HiddenElementError("Hidden Element")
+        return [*self._data[key]["texts"]]
+
+    async def printscreen(self) -> bytes:
+        return None
+
+
+page_scripts_script = """
+() => [...document.querySelectorAll("script")].map(
+    (script) => script.textContent
+)
+"""
+
+
+def _iter_dicts(
+    data: dict | list, predicate: Callable[[dict], bool]
+) -> Iterator[dict]:
+    pending = deque([data])
+    while pending:
+        item = pending.popleft()
+        if isinstance(item, dict):
+            if predicate(item):
+                yield item
+                continue
+            pending.extend(item.values())
+        elif isinstance(item, list):
+            pending.extend(item)
+
+
+def _find_dict(data: dict | list, predicate: Callable[[dict], bool]) -> dict:
+    return next(_iter_dicts(data, predicate), None)
+
+
+def _to_datetime(value: str) -> datetime:
+    match = value and re.search(r"\d+-\d+-\d+T\d+:\d+:\d+", value)
+    return match and datetime.strptime(match[0], "%Y-%m-%dT%H:%M:%S")
+
+
+def _to_float(value: str | int | float) -> float:
+    return float(value) if value not in [None, ""] else None
+
+
+class ListingState:
+
+    def __init__(self, script_texts: List[str]) -> None:
+        self.script_texts = [text for text in script_texts if text]
+        self.documents = []
+        for text in self.script_texts:
+            try:
+                self.documents.append(json.loads(text))
+            except ValueError:
+                pass
+        self.listing = (
+            _find_dict(self.documents, lambda item: "pricingInfos" in item)
+            or {}
+        )
+        self.account = (
+            _find_dict(
+                self.documents,
+                lambda item: isinstance(item.get("account"), dict)
+                and "listing" in item,
+            )
+            or {}
+        ).get("account") or {}
+
+    @classmethod
+    def from_listing(cls, listing: dict, account: dict = None) -> Self:
+        state = cls([])
+        state.listing, state.account = listing or {}, account or {}
+        return state
+
+    def _first_int(self, key: str) -> int:
+        values = self.listing.get(key) or []
+        return int(values[0]) if values else None
+
+    def _search_datetime(self, key: str) -> datetime:
+        for text_content in self.script_texts:
+            match = re.search(
+                rf"{key}.+:.+\d+-\d+-\d+T\d+:\d+:\d+", text_content
+            )
+            if match:
+                return _to_datetime(match[0])
+        return None
+
+    def _pricing_info(self, business_type: str) -> dict:
+        return next(
+            (
+                pricing_info
+                for pricing_info in self.listing.get("pricingInfos") or []
+                if pricing_info.get("businessType") == business_type
+            ),
+            {},
+        )
+
+    def publication_created_at(self) -> datetime:
+        return _to_datetime(
+            self.listing.get("createdAt")
+        ) or self._search_datetime("createdAt")
+
+    def publication_updated_at(self) -> datetime:
+        return _to_datetime(
+            self.listing.get("updatedAt")
+        ) or self._search_datetime("updatedAt")
+
+    def description(self) -> str:
+        return self.listing.get("title")
+
+    def details(self) -> str:
+        return self.listing.get("description")
+
+    def square_meter(self) -> int:
+        return self._first_int("usableAreas")
+
+    def bedrooms(self) -> int:
+        return self._first_int("bedrooms")
+
+    def bathrooms(self) -> int:
+        return self._first_int("bathrooms")
+
+    def car_spaces(self) -> int:
+        return self._first_int("parkingSpaces")
+
+    def broker(self) -> str:
+        return self.account.get("name")
+
+    def address(self) -> str:
+        address = self.listing.get("address") or {}
+        street = ", ".join(
+            filter(None, [address.get("street"), address.get("streetNumber")])
+        )
+        city = " - ".join(
+            filter(None, [address.get("city"), address.get("stateAcronym")])
+        )
+        location = ", ".join(filter(None, [address.get("neighborhood"), city]))
+        return " - ".join(filter(None, [street, location])) or None
+
+    def floor(self) -> int:
+        floor = self.listing.get("unitFloor")
+        return int(floor) if floor not in [None, ""] else None
+
+    def buy_price(self) -> float:
+        return _to_float(self._pricing_info("SALE").get("price"))
+
+    def rent_price(self) -> float:
+        return _to_float(self._pricing_info("RENTAL").get("price"))
+
+    def condominium_fee(self) -> float:
+        return _to_float(
+            (self._pricing_info("SALE") or self._pricing_info("RENTAL")).get(
+                "monthlyCondoFee"
+            )
+        )
+
+    def iptu_tax(self) -> float:
+        return _to_float(
+            (self._pricing_info("SALE") or self._pricing_info("RENTAL")).get(
+                "yearlyIptu"
+            )
+        )
+
+
+class ListingResultMapper(ResultCardMapper):
+
+    def __init__(self, result: dict, website: str) -> None:
+        self._listing_state = ListingState.from_listing(
+            result.get("listing"), result.get("account")
+        )
+        href = (result.get("link") or {}).get("href")
+        self._link = href and urljoin(website, href)
+
+    async def _url(self) -> str:
+        return self._link
+
+    async def address(self) -> str:
+        return self._listing_state.address()
+
+    async def details(self) -> str:
+        return self._listing_state.details()
+
+    async def square_meter(self) -> int:
+        return self._listing_state.square_meter()
+
+    async def bedrooms(self) -> int:
+        return self._listing_state.bedrooms()
+
+    async def bathrooms(self) -> int:
+        return self._listing_state.bathrooms()
+
+    async def car_spaces(self) -> int:
+        return self._listing_state.car_spaces()
+
+    async def buy_price(self) -> float:
+        return self._listing_state.buy_price()
+
+    async def rent_price(self) -> float:
+        return self._listing_state.rent_price()
+
+    async def condominium_fee(self) -> float:
+        return self._listing_state.condominium_fee()
+
+    async def iptu_tax(self) -> float:
+        return self._listing_state.iptu_tax()
+
+    async def publication_created_at(self) -> datetime:
+        return self._listing_state.publication_created_at()
+
+    async def publication_updated_at(self) -> datetime:
+        return self._listing_state.publication_updated_at()
+
+    async def printscreen(self) -> bytes:
+        return None
+
+
+class ListingPageMapper(ListingResultMapper):
+
+    def __init__(self, listing_state: ListingState, url: str) -> None:
+        self._listing_state = listing_state
+        self._link = url
+
+    async def description(self) -> str:
+        return self._listing_state.description()
+
+    async def broker(self) -> str:
+        return self._listing_state.broker()
+
+    async def floor(self) -> int:
+        return self._listing_state.floor()
+
+
+class ScriptsParser(HTMLParser):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.script_texts: List[str] = []
+        self._in_script = False
+
+    @classmethod
+    def parse(cls, html: str) -> List[str]:
+        parser = cls()
+        parser.feed(html)
+        parser.close()
+        return parser.script_texts
+
+    def handle_starttag(self, tag: str, attrs: list):
+        if tag == "script":
+            self._in_script = True
+            self.script_texts.append("")
+
+    def handle_endtag(self, tag: str):
+        if tag == "script":
+            self._in_script = False
+
+    def handle_data(self, data: str):
+        if self._in_script:
+            self.script_texts[-1] = self.script_texts[-1] + data
+
+
 class PublicationMapper(ModelMapper[Locator]):
 
     def __init__(self, main_content: Locator) -> None:
         self._main_content = main_content
+        self._listing_state: ListingState = None
+
+    async def _state(self) -> ListingState:
+        if self._listing_state is None:
+            try:
+                script_texts = await self._main_content.page.evaluate(
+                    page_scripts_script
+                )
+            except Error as ex:
+                logger.warning("Failed to read page scripts: %s", str(ex))
+                script_texts = []
+            self._listing_state = ListingState(script_texts)
+        return self._listing_state
 
     async def _before(self):
         await self._main_content.locator(
@@ -272,18 +639,20 @@ class PublicationMapper(ModelMapper[Locator]):
         ).click()
 
     async def description(self) -> str:
-        return await self._visible(
+        return (await self._state()).description() or await self._visible(
             self._main_content.locator(".description__title").first
         ).text_content()
 
     async def broker(self) -> str:
-        return await self._visible(
+        return (await self._state()).broker() or await self._visible(
             self._main_content.locator(
                 ".desktop-only-container .advertiser-info__credentials--name"
             ).first
         ).text_content()
 
     async def buy_price(self) -> float:
+        if (buy_price := (await self._state()).buy_price()) is not None:
+            return buy_price
         inner_Locator = self._main_content.locator(".price-both-wrapper")
         if await inner_Locator.is_hidden():
             inner_Locator = inner_Locator.or_(
@@ -302,6 +671,8 @@ class PublicationMapper(ModelMapper[Locator]):
         )
 
     async def rent_price(self) -> float:
+        if (rent_price := (await self._state()).rent_price()) is not None:
+            return rent_price
         inner_Locator = self._main_content.locator(".price-both-wrapper")
         if await inner_Locator.is_hidden():
             inner_Locator = inner_Locator.or_(
@@ -319,7 +690,15 @@ class PublicationMapper(ModelMapper[Locator]):
             else None
         )
 
+    async def condominium_fee(self) -> float:
+        return (await self._state()).condominium_fee()
+
+    async def iptu_tax(self) -> float:
+        return (await self._state()).iptu_tax()
+
     async def floor(self) -> int:
+        if (floor := (await self._state()).floor()) is not None:
+            return floor
         match = await self._visible(
             self._main_content.locator("[itemprop=floorLevel]")
         ).text_content()
@@ -333,37 +712,15 @@ class PublicationMapper(ModelMapper[Locator]):
         return 1 if has_balcony else 0
 
     async def address(self) -> str:
-        return await self._visible(
+        return (await self._state()).address() or await self._visible(
             self._main_content.locator(".address-info-value")
         ).text_content()
 
     async def publication_created_at(self) -> datetime:
-        script_locator = self._main_content.page.locator("script")
-        for index in range(await script_locator.count()):
-            text_content = await script_locator.nth(index).text_content()
-            match = re.search(
-                r"createdAt.+:.+\d+-\d+-\d+T\d+:\d+:\d+", text_content
-            )
-            if match:
-                match = match and re.search(
-                    r"\d+-\d+-\d+T\d+:\d+:\d+", match[0]
-                )
-                return datetime.strptime(match[0], "%Y-%m-%dT%H:%M:%S")
-        return None
+        return (await self._state()).publication_created_at()
 
     async def publication_updated_at(self) -> datetime:
-        script_locator = self._main_content.page.locator("script")
-        for index in range(await script_locator.count()):
-            text_content = await script_locator.nth(index).text_content()
-            match = re.search(
-                r"updatedAt.+:.+\d+-\d+-\d+T\d+:\d+:\d+", text_content
-            )
-            if match:
-                match = match and re.search(
-                    r"\d+-\d+-\d+T\d+:\d+:\d+", match[0]
-                )
-                return datetime.strptime(match[0], "%Y-%m-%dT%H:%M:%S")
-        return None
+        return (await self._state()).publication_updated_at()
 
 
 @inject
@@ -378,95 +735,339 @@ class ZapImoveis(Publisher):
         ]
     )
 
-    def __init__(self, settings: Settings) -> None:
+    def __init__(
+        self, settings: Settings, image_executor: ImageExecutor
+    ) -> None:
         self.publisher_settings = settings.default_publisher_settings
+        self.image_executor = image_executor
+        self._captured_listings: Dict[Page, Dict[str, dict]] = {}
+        self._unfinished_cursors: Dict[str, tuple] = {}
+        self._inspected_urls: set[str] = set()
 
-    async def inspect_search_results_page(self, page: Page) -> Self:
-        publication_count = []
-        while True:
-            await page.wait_for_timeout(1000 * 5)
-            buttton_next_locator = page.locator(
-                "section.listing-wrapper__pagination "
-                "button[aria-label='Próxima página']"
-            ).first
+    async def _save_picture(self, url: str, images: List[bytes]):
+        picture = await self.image_executor.vertically_concat_images(images)
+        picture and publications.save({"url": url, "picture": picture})
 
-            logger.info("Scrolling down to the end of the page...")
+    async def _capture_listings(self, page: Page, response: Response):
+        if not re.search(listing_api_url_pattern, response.url):
+            return
+        try:
+            data = await response.json()
+        except (Error, ValueError) as ex:
+            logger.warning("Failed to decode listings response: %s", str(ex))
+            return
+        captured_listings = self._captured_listings.setdefault(page, {})
+        for result in _iter_dicts(
+            data, lambda item: "listing" in item and "link" in item
+        ):
+            publication = await ListingResultMapper(
+                result, self.website
+            ).get_dict(PropertyPublication)
+            if publication.get("url"):
+                captured_listings[urlsplit(publication["url"]).path] = (
+                    publication
+                )
 
-            result_card_locator = page.locator("a[itemprop=url]")
-            async for result_card in PageHelper.scroll_to_end(
+    async def _printscreen(self, result_card: Locator) -> bytes:
+        try:
+            return await ResultCardMapper(result_card).printscreen()
+        except TimeoutError as ex:
+            logger.warning("Failed to get printscreen information: %s", ex)
+
+    async def _known_result_card(
+        self, result_card: Locator, incremental: publications.IncrementalSearch
+    ) -> bool:
+        if not incremental.stop_after:
+            return False
+        href = await result_card.get_attribute("href")
+        if not href:
+            return False
+        fingerprint = sha1(
+            (await result_card.inner_text()).encode()
+        ).hexdigest()
+        return incremental.is_known(urljoin(self.website, href), fingerprint)
+
+    def _scroll_result_cards(
+        self, page: Page, result_card_locator: Locator, end_locator: Locator
+    ) -> AsyncIterator[Locator]:
+        if self.publisher_settings.scroll_driver == "observer":
+            return PageHelper.observe_to_end(
                 page,
-                pixels_to_scroll=200,
-                locator=result_card_locator,
-                end=buttton_next_locator,
-            ):
-                result_card: Locator
-                if await result_card.is_visible():
-                    logger.info(
-                        "Getting info from URL: %s",
-                        await result_card.get_attribute("href"),
-                    )
+                result_card_selector,
+                end=end_locator,
+                jitter=self.publisher_settings.scroll_jitter,
+            )
+        return PageHelper.scroll_to_end(
+            page,
+            pixels_to_scroll=200,
+            locator=result_card_locator,
+            end=end_locator,
+        )
+
+    async def _inspect_result_cards(
+        self,
+        page: Page,
+        result_card_locator: Locator,
+        end_locator: Locator,
+        publications_buffer: publications.PublicationsBuffer,
+        incremental: publications.IncrementalSearch,
+    ):
+        search_result = {
+            "search_url": page.url,
+            "to_inspect": True,
+            "deleted": False,
+        }
+        if self.publisher_settings.capture_listings:
+            await self._inspect_captured_result_cards(
+                page,
+                result_card_locator,
+                publications_buffer,
+                incremental,
+                search_result,
+            )
+            return
+        batch_extraction = self.publisher_settings.batch_extraction
+        printscreens: Dict[int, bytes] = {}
+        index = -1
+        async for result_card in self._scroll_result_cards(
+            page, result_card_locator, end_locator
+        ):
+            result_card: Locator
+            index = index + 1
+            await result_card.scroll_into_view_if_needed()
+            if await self._known_result_card(result_card, incremental):
+                if incremental.exhausted:
+                    break
+                continue
+            if batch_extraction:
+                printscreens[index] = await self._printscreen(result_card)
+                continue
+            if await result_card.is_visible():
+                logger.info(
+                    "Getting info from URL: %s",
+                    await result_card.get_attribute("href"),
+                )
+            publication = await ResultCardMapper(result_card).get_dict(
+                PropertyPublication
+            )
+            await publications_buffer.add({**publication, **search_result})
+
+        if not batch_extraction:
+            return
+        for index, publication in enumerate(
+            await ResultCardMapper.get_dicts(result_card_locator)
+        ):
+            if index not in printscreens:
+                continue
+            logger.info("Getting info from URL: %s", publication.get("url"))
+            await publications_buffer.add(
+                {
+                    **publication,
+                    "printscreen": printscreens[index],
+                    **search_result,
+                }
+            )
+
+    async def _inspect_captured_result_cards(
+        self,
+        page: Page,
+        result_card_locator: Locator,
+        publications_buffer: publications.PublicationsBuffer,
+        incremental: publications.IncrementalSearch,
+        search_result: dict,
+    ):
+        captured_listings = self._captured_listings.setdefault(page, {})
+        index = 0
+        while index < await result_card_locator.count():
+            result_card = result_card_locator.nth(index)
+            index = index + 1
+            href = await result_card.get_attribute("href")
+            publication = captured_listings.pop(
+                urlsplit(urljoin(self.website, href or "")).path, None
+            )
+            if await self._known_result_card(result_card, incremental):
+                if incremental.exhausted:
+                    break
+                continue
+            if publication:
+                publication = {
+                    **publication,
+                    "printscreen": await self._printscreen(result_card),
+                }
+            else:
                 await result_card.scroll_into_view_if_needed()
                 publication = await ResultCardMapper(result_card).get_dict(
                     PropertyPublication
                 )
-                publications.save(
-                    {
-                        **publication,
-                        "search_url": page.url,
-                        "to_inspect": True,
-                        "deleted": False,
-                    }
+            logger.info("Getting info from URL: %s", publication.get("url"))
+            await publications_buffer.add({**publication, **search_result})
+        for publication in (
+            [] if incremental.exhausted else captured_listings.values()
+        ):
+            logger.info("Getting info from URL: %s", publication.get("url"))
+            await publications_buffer.add({**publication, **search_result})
+        captured_listings.clear()
+
+    async def _go_to_next_page(self, page: Page) -> bool:
+        buttton_next_locator = page.locator(
+            "section.listing-wrapper__pagination "
+            "button[aria-label='Próxima página']"
+        ).first
+        if not await buttton_next_locator.is_visible():
+            return False
+        logger.info("Going to next page...")
+        await buttton_next_locator.scroll_into_view_if_needed()
+        async with self.ready(page, "search_results_next_page"):
+            await buttton_next_locator.click()
+        return True
+
+    async def inspect_search_results_page(self, page: Page) -> Self:
+        publication_count = []
+        searcher = current_searcher.get()
+        incremental = publications.IncrementalSearch(
+            self.name,
+            searcher,
+            page.url,
+            self.publisher_settings.incremental_stop_after,
+        )
+        state = self.publisher_settings.resume and crawl_state.get(
+            self.name, searcher
+        )
+        async with publications.PublicationsBuffer(
+            on_flush=self.publications_saved
+        ) as publications_buffer:
+            page_number = 1
+            if state and state.page_number and state.page_url:
+                logger.info("Resuming search on page %s", state.page_number)
+                await page.goto(state.page_url)
+                page_number = state.page_number
+            await self.wait_until(page, "search_results")
+            while True:
+                buttton_next_locator = page.locator(
+                    "section.listing-wrapper__pagination "
+                    "button[aria-label='Próxima página']"
+                ).first
+
+                logger.info("Scrolling down to the end of the page...")
+
+                result_card_locator = page.locator(result_card_selector)
+                await self._inspect_result_cards(
+                    page,
+                    result_card_locator,
+                    buttton_next_locator,
+                    publications_buffer,
+                    incremental,
                 )
 
-            publication_count.append(await result_card_locator.count())
-            logger.info(
-                "%s publication(s) found on page %s",
-                publication_count[-1],
-                len(publication_count),
-            )
+                publication_count.append(await result_card_locator.count())
+                logger.info(
+                    "%s publication(s) found on page %s",
+                    publication_count[-1],
+                    page_number,
+                )
 
-            if await buttton_next_locator.is_visible():
-                logger.info("Going to next page...")
-                await buttton_next_locator.scroll_into_view_if_needed()
-                await buttton_next_locator.click()
-            else:
-                break
+                if incremental.exhausted:
+                    logger.info(
+                        "Stopping search after %s known publication(s)",
+                        incremental.streak,
+                    )
+                    break
+                await publications_buffer.flush()
+                if not await self._go_to_next_page(page):
+                    break
+                page_number = page_number + 1
+                searcher and crawl_state.save(
+                    self.name,
+                    searcher,
+                    page_number=page_number,
+                    page_url=page.url,
+                )
+        incremental.save()
         logger.info("Total of %s publication(s) found", sum(publication_count))
 
     async def query_publication_urls(self) -> str:
-        start, stop = 0, 10
-        stop_step = stop
-        count, urls = publications.urls_by_publisher(
-            self.name,
-            slice=(start, stop),
-            only_inspect=self.publisher_settings.only_inspect,
-        )
-        while urls:
-            previous_count = count
+        if budget := self.publisher_settings.inspection_budget:
+            urls = scheduler.due_urls(self.name, budget)
             logger.info(
-                "Processing %s of %s total publication URLs...",
-                len(urls),
-                count,
+                "Processing %s scheduled publication URLs...", len(urls)
             )
             for url in urls:
                 yield url
-            if (
-                count == previous_count
-                and not self.publisher_settings.only_inspect
-            ):
-                start = stop
-                stop = stop + stop_step
-            count, urls = publications.urls_by_publisher(
+            return
+        logger.info(
+            "Processing %s total publication URLs...",
+            publications.count_urls_by_publisher(
+                self.name, only_inspect=self.publisher_settings.only_inspect
+            ),
+        )
+        state = self.publisher_settings.resume and crawl_state.get(
+            self.name, crawl_state.publications_stage
+        )
+        after = (
+            (state.cursor_created_at, state.cursor_url)
+            if state and state.cursor_url
+            else None
+        )
+        if after:
+            logger.info("Resuming publications after %s", after[1])
+        self._unfinished_cursors, self._inspected_urls = {}, set()
+        for cursor in publications.iter_urls_by_publisher(
+            self.name,
+            batch_size=self.publisher_settings.urls_batch_size,
+            only_inspect=self.publisher_settings.only_inspect,
+            after=after,
+            cursors=True,
+        ):
+            self._unfinished_cursors[cursor[1]] = cursor
+            yield cursor[1]
+
+    async def publication_inspected(self, publication_url: str):
+        if publication_url not in self._unfinished_cursors:
+            return
+        self._inspected_urls.add(publication_url)
+        checkpoint = None
+        while (
+            self._unfinished_cursors
+            and (oldest_url := next(iter(self._unfinished_cursors)))
+            in self._inspected_urls
+        ):
+            checkpoint = self._unfinished_cursors.pop(oldest_url)
+            self._inspected_urls.discard(oldest_url)
+        if checkpoint:
+            crawl_state.save(
                 self.name,
-                slice=(start, stop),
-                only_inspect=self.publisher_settings.only_inspect,
+                crawl_state.publications_stage,
+                cursor_created_at=checkpoint[0],
+                cursor_url=checkpoint[1],
             )
 
     async def setup_page(self, load_type: str, page: Page, url: str):
-        if (
+        download_pictures = (
             self.publisher_settings.always_download_pictures
             or not publications.already_have_photo(url)
-        ) and load_type != self.inspect_publication_page.__name__:
+        )
+        await self.route_page(
+            load_type,
+            page,
+            allowed_url_patterns=(
+                [r"/fit-in/\d+x\d+/"]
+                if download_pictures
+                and load_type == self.inspect_publication_page.__name__
+                else []
+            ),
+        )
+        if (
+            self.publisher_settings.capture_listings
+            and load_type == self.inspect_search_results_page.__name__
+        ):
+            page.on("response", partial(self._capture_listings, page))
+            page.once(
+                "close", lambda _: self._captured_listings.pop(page, None)
+            )
+        if (
+            download_pictures
+            and load_type != self.inspect_publication_page.__name__
+        ):
             return
 
         images: List[bytes] = []
@@ -485,13 +1086,48 @@ class ZapImoveis(Publisher):
 
         async def close_handler(_):
             page.remove_listener("response", response_handler)
-            images and publications.save(
-                {"url": url, "picture": vertically_concat_images(images)}
-            )
+            images and self.run_in_background(self._save_picture(url, images))
 
         page.on("response", response_handler)
         page.once("close", close_handler)
 
+    async def inspect_publication_http(self, publication_url: str) -> bool:
+        if (
+            self.publisher_settings.always_download_pictures
+            or not publications.already_have_photo(publication_url)
+        ):
+            return False
+        fetched = await fetch(publication_url)
+        blocked = is_bot_protection(fetched.text)
+        throttle.report(fetched.status, blocked=blocked)
+        if fetched.status == 404 or "/404/" in fetched.url:
+            publications.save(
+                {"url": publication_url, "to_inspect": False, "deleted": True}
+            )
+            return True
+        if fetched.status != 200 or blocked:
+            logger.warning(
+                "Publication page needs a browser (HTTP %s): %s",
+                fetched.status,
+                publication_url,
+            )
+            return False
+        listing_state = ListingState(ScriptsParser.parse(fetched.text))
+        if not listing_state.listing:
+            return False
+        detailed_publication = await ListingPageMapper(
+            listing_state, publication_url
+        ).get_dict(PropertyPublication)
+        publications.save(
+            {
+                "url": publication_url,
+                "to_inspect": False,
+                "deleted": False,
+                **detailed_publication,
+            }
+        )
+        return True
+
     async def inspect_publication_page(
         self, page: Page, publication_url: str
     ) -> Self:
@@ -501,8 +1137,14 @@ class ZapImoveis(Publisher):
             )
             return
 
-        await PageHelper.wait_for_timeout(page, 1000)
+        await self.wait_until(page, "publication_content")
         main_content = page.locator(".base-page__main-content")
+        if not await main_content.count() and is_bot_protection(
+            await page.content()
+        ):
+            throttle.report(blocked=True)
+            logger.warning("Publication page is bot protected: %s", page.url)
+            return
         detailed_publication = await PublicationMapper(main_content).get_dict(
             PropertyPublication
         )
@@ -518,12 +1160,12 @@ class ZapImoveis(Publisher):
             self.publisher_settings.always_download_pictures
             or not publications.already_have_photo(publication_url)
         ) and await page.locator(".carousel-photos--wrapper").is_visible():
-            await page.locator(".carousel-photos--wrapper").click()
-            await PageHelper.wait_for_timeout(page, 200)
-            await page.locator(
-                ".image-container .image-container__item"
-            ).first.click()
-            await PageHelper.wait_for_timeout(page, 1 * 1000)
+            async with self.ready(page, "publication_carousel"):
+                await page.locator(".carousel-photos--wrapper").click()
+            async with self.ready(page, "publication_pictures"):
+                await page.locator(
+                    ".image-container .image-container__item"
+                ).first.click()
 
     async def playground(self) -> Self:
         pass
@@ -0,0 +1,119 @@
+from datetime import UTC, datetime, timedelta
+from typing import Dict, List
+from kink import inject
+from sqlalchemy import case, func
+from sqlmodel import Session, col, desc, select
+from app.domains.models import InspectionSchedule, PropertyPublication
+from app.settings import Settings
+
+# Only fields that result cards and publication pages report in the same
+# form; free text such as the address is formatted differently by each.
+tracked_fields = [
+    "square_meter",
+    "bedrooms",
+    "bathrooms",
+    "car_spaces",
+    "buy_price",
+    "rent_price",
+    "iptu_tax",
+    "condominium_fee",
+]
+
+
+def changed_fields(model: PropertyPublication, data: dict) -> List[str]:
+    if model is None:
+        return []
+    return [
+        key
+        for key in tracked_fields
+        if data.get(key) is not None
+        and getattr(model, key) is not None
+        and data.get(key) != getattr(model, key)
+    ]
+
+
+def _aware(value: datetime) -> datetime:
+    return value.replace(tzinfo=UTC) if value and not value.tzinfo else value
+
+
+@inject
+def _plan(
+    schedule: InspectionSchedule, created_at: datetime, settings: Settings
+):
+    now = datetime.now(UTC)
+    inspected_at = _aware(schedule.inspected_at)
+    age = now - (_aware(created_at) or now)
+    interval = timedelta(
+        hours=settings.default_publisher_settings.inspection_interval_hours
+    ) / (1 + schedule.change_count)
+    schedule.next_due_at = (
+        now
+        if inspected_at is None or schedule.card_changed
+        else inspected_at + interval
+    )
+    schedule.priority = (
+        (4 if inspected_at is None else 0)
+        + (3 if schedule.card_changed else 0)
+        + min(schedule.change_count, 5) * 0.5
+        + 2 / (1 + age.total_seconds() / timedelta(days=1).total_seconds())
+    )
+
+
+def track(session: Session, changes: Dict[str, List[str]], inspected: bool):
+    schedules = {
+        schedule.url: schedule
+        for schedule in session.exec(
+            select(InspectionSchedule).where(
+                col(InspectionSchedule.url).in_(changes.keys())
+            )
+        )
+    }
+    for url, publisher, created_at in session.exec(
+        select(
+            PropertyPublication.url,
+            PropertyPublication.publisher,
+            PropertyPublication.created_at,
+        ).where(col(PropertyPublication.url).in_(changes.keys()))
+    ):
+        schedule = schedules.get(url) or InspectionSchedule(
+            url=url, publisher=publisher
+        )
+        if inspected:
+            schedule.inspected_at = datetime.now(UTC)
+            schedule.card_changed = False
+        elif changes[url]:
+            schedule.change_count = schedule.change_count + 1
+            schedule.card_changed = True
+        _plan(schedule, created_at)
+        session.add(schedule)
+
+
+@inject
+def due_urls(publisher: str, limit: int, session: Session = None) -> List[str]:
+    with session:
+        return list(
+            session.exec(
+                select(PropertyPublication.url)
+                .outerjoin(
+                    InspectionSchedule,
+                    InspectionSchedule.url == PropertyPublication.url,
+                )
+                .where(
+                    PropertyPublication.publisher == publisher,
+                    col(PropertyPublication.deleted).is_not(True),
+                    func.coalesce(InspectionSchedule.next_due_at, datetime.min)
+                    <= datetime.now(UTC),
+                )
+                .order_by(
+                    desc(
+                        func.coalesce(InspectionSchedule.priority, 4)
+                        + case(
+                            (col(PropertyPublication.favorited).is_(True), 2),
+                            else_=0,
+                        )
+                    ),
+                    desc(PropertyPublication.created_at),
+                )
+                .limit(limit)
+            )
+        )
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Optional
+from playwright.async_api import TimeoutError
+from app.settings import ThrottleSettings
+
+logger = logging.getLogger(__name__)
+
+congestion_statuses = [403, 429, 503]
+
+
+class Slot:
+
+    def __init__(self) -> None:
+        self.status: Optional[int] = None
+        self.blocked = False
+        self.timed_out = False
+        self.latency: Optional[float] = None
+
+
+_current_slot: ContextVar[Optional[Slot]] = ContextVar(
+    "current_slot", default=None
+)
+
+
+def report(
+    status: int = None,
+    blocked: bool = False,
+    timed_out: bool = False,
+    latency: float = None,
+):
+    slot = _current_slot.get()
+    if slot is None:
+        return
+    if status is not None:
+        slot.status = status
+    if latency is not None:
+        slot.latency = max(slot.latency or 0, latency)
+    slot.blocked = slot.blocked or blocked
+    slot.timed_out = slot.timed_out or timed_out
+
+
+class AdaptiveController:
+
+    def __init__(self, settings: ThrottleSettings, concurrency: int) -> None:
+        self.settings = settings
+        self.max_concurrency = max(settings.max_concurrency or concurrency, 1)
+        self.min_concurrency = max(
+            min(settings.min_concurrency, self.max_concurrency), 1
+        )
+        self.limit = float(self.min_concurrency)
+        self.delay = settings.min_delay
+        self.in_flight = 0
+        self._last_start = 0.0
+        self._condition = asyncio.Condition()
+
+    def _adjust(self, congested: bool):
+        if congested:
+            self.limit = max(
+                self.min_concurrency, self.limit * self.settings.backoff
+            )
+            self.delay = min(
+                self.settings.max_delay,
+                max(
+                    self.delay / self.settings.backoff,
+                    self.settings.delay_step,
+                ),
+            )
+            logger.info(
+                "Backing off to %s concurrent request(s), %.1fs apart",
+                int(self.limit),
+                self.delay,
+            )
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.delay = max(
+                self.settings.min_delay, self.delay - self.settings.delay_step
+            )
+
+    @asynccontextmanager
+    async def slot(self) -> Slot:
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self.in_flight < int(self.limit)
+            )
+            wait = self._last_start + self.delay - monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_start = monotonic()
+            self.in_flight = self.in_flight + 1
+        slot = Slot()
+        token = _current_slot.set(slot)
+        congested = False
+        try:
+            yield slot
+        except (TimeoutError, asyncio.TimeoutError) as ex:
+            congested = True
+            raise ex
+        finally:
+            _current_slot.reset(token)
+            self._adjust(
+                congested
+                or slot.timed_out
+                or slot.blocked
+                or slot.status in congestion_statuses
+                or (slot.latency or 0) > self.settings.latency_target
+            )
+            async with self._condition:
+                self.in_flight = self.in_flight - 1
+                self._condition.notify_all()
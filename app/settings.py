@@ -1,10 +1,11 @@
+from pydantic import ValidationInfo, field_validator
 from pydantic_settings import (
     BaseSettings,
     PydanticBaseSettingsSource,
     SettingsConfigDict,
     YamlConfigSettingsSource,
 )
-from typing import List, Optional, Type, Tuple
+from typing import Dict, List, Literal, Optional, Type, Tuple
 
 
 class SearchSettings(BaseSettings):
@@ -19,6 +20,47 @@ class SearchSettings(BaseSettings):
     bedrooms: List[int] = []
 
 
+class RoutingSettings(BaseSettings):
+    blocked_resource_types: List[str] = []
+    blocked_url_patterns: List[str] = []
+    allowed_url_patterns: List[str] = []
+
+
+class WaitSettings(BaseSettings):
+    selector: Optional[str] = None
+    state: Literal["attached", "detached", "visible", "hidden"] = "visible"
+    load_state: Optional[
+        Literal["load", "domcontentloaded", "networkidle"]
+    ] = None
+    response: Optional[str] = None
+    quiet: int = 0
+    timeout: int = 10000
+    delay: int = 0
+
+
+class ThrottleSettings(BaseSettings):
+    enabled: bool = False
+    min_concurrency: int = 1
+    max_concurrency: int = 0
+    min_delay: float = 0
+    max_delay: float = 30
+    delay_step: float = 0.5
+    backoff: float = 0.5
+    latency_target: float = 15
+
+
+tracking_url_patterns = [
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"googlesyndication\.com",
+    r"doubleclick\.net",
+    r"facebook\.(net|com)/tr",
+    r"hotjar\.com",
+    r"clarity\.ms",
+    r"newrelic\.com|nr-data\.net",
+]
+
+
 class PublisherSettings(BaseSettings):
 
     def __init__(self, *args, **kwargs):
@@ -42,10 +84,64 @@ class PublisherSettings(BaseSettings):
 
     only_inspect: bool = True
     always_download_pictures: bool = False
+    concurrency: int = 1
+    urls_batch_size: int = 100
+    parallel_search: bool = False
+    pipelined: bool = False
+    batch_extraction: bool = False
+    capture_listings: bool = False
+    incremental_stop_after: int = 0
+    scroll_driver: Literal["wheel", "observer"] = "wheel"
+    scroll_jitter: int = 0
+    resume: bool = False
+    inspection_budget: int = 0
+    inspection_interval_hours: float = 24
+    http_fast_path: bool = False
+    throttle: ThrottleSettings = ThrottleSettings()
+    routing: Dict[str, RoutingSettings] = {
+        "inspect_search_results_page": RoutingSettings(
+            blocked_resource_types=["font", "media"],
+            blocked_url_patterns=tracking_url_patterns,
+        ),
+        "inspect_publication_page": RoutingSettings(
+            blocked_resource_types=["font", "media", "image"],
+            blocked_url_patterns=tracking_url_patterns,
+        ),
+    }
+    waits: Dict[str, WaitSettings] = {
+        "inspect_search_results_page": WaitSettings(
+            load_state="networkidle", timeout=1000
+        ),
+        "inspect_publication_page": WaitSettings(
+            load_state="networkidle", timeout=1000
+        ),
+        "search_results": WaitSettings(
+            selector="a[itemprop=url]", timeout=5000
+        ),
+        "search_results_next_page": WaitSettings(
+            selector="a[itemprop=url]",
+            response=r"/v\d+/listings",
+            timeout=5000,
+        ),
+        "publication_content": WaitSettings(
+            selector=".base-page__main-content", timeout=1000
+        ),
+        "publication_carousel": WaitSettings(
+            selector=".image-container .image-container__item", timeout=2000
+        ),
+        "publication_pictures": WaitSettings(
+            response=r"/fit-in/\d+x\d+/", quiet=300, timeout=1000
+        ),
+    }
     base_search: SearchSettings = SearchSettings()
     buying_search: SearchSettings = SearchSettings()
     renting_search: SearchSettings = SearchSettings()
 
+    @field_validator("routing", "waits", mode="before")
+    @classmethod
+    def merge_defaults(cls, value: dict, info: ValidationInfo) -> dict:
+        return {**cls.model_fields[info.field_name].default, **(value or {})}
+
     model_config = SettingsConfigDict(yaml_file="config/default.yaml")
 
     @classmethod
@@ -60,6 +156,8 @@ class PublisherSettings(BaseSettings):
 class Settings(BaseSettings):
     db_connection_uri: str = "sqlite:///data.db"
     db_echo: bool = False
+    db_write_batch_size: int = 50
+    db_write_flush_interval: float = 5.0
 
     browser_headless: bool = False
     browser_channel: str = "firefox"
@@ -67,6 +165,30 @@ class Settings(BaseSettings):
     browser_args: List[str] = []
     # browser_no_viewport: bool = True
     browser_no_viewport: bool = False
+    browser_context_max_navigations: int = 50
+
+    http_user_agent: str = (
+        "Mozilla/5.0 (X11; Linux x86_64; rv:126.0) Gecko/20100101 "
+        "Firefox/126.0"
+    )
+    http_accept_language: str = "pt-BR,pt;q=0.9,en;q=0.8"
+    http_timeout: float = 30000
+
+    max_concurrent_publishers: int = 0
+
+    media_path: str = "media"
+    media_max_age: int = 60 * 60 * 24 * 365
+    thumbnail_sizes: Dict[str, int] = {
+        "small": 240,
+        "medium": 480,
+        "large": 960,
+    }
+
+    web_page_size: int = 20
+    web_max_page_size: int = 100
+
+    image_workers: int = 2
+    image_queue_size: int = 8
 
     default_publisher_settings: PublisherSettings = PublisherSettings()
 
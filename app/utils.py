@@ -1,29 +1,107 @@
+import asyncio
 import cv2
+import logging
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
 from typing import List
+from kink import inject
+from app.settings import Settings
+
+log_prefix: ContextVar[str] = ContextVar("log_prefix", default="")
+
+
+class LogPrefixFilter(logging.Filter):
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        prefix = log_prefix.get()
+        if prefix:
+            record.msg = f"[{prefix}] {record.msg}"
+        return True
 
 
 def vertically_concat_images(
     images: List[bytes], interpolation: int = cv2.INTER_CUBIC
 ) -> bytes:
-    images = [np.fromstring(image, np.uint8) for image in images]
-    images: List[cv2.typing.MatLike] = [
-        cv2.imdecode(image, cv2.IMREAD_COLOR) for image in images
-    ]
-    minimum_width = min(image.shape[1] for image in images)
-    resized_images = [
-        cv2.resize(
-            image,
-            (
-                minimum_width,
-                int(image.shape[0] * minimum_width / image.shape[1]),
-            ),
-            interpolation=interpolation,
+    decoded_images: List[cv2.typing.MatLike] = [
+        decoded_image
+        for decoded_image in (
+            cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+            for image in images
         )
-        for image in images
+        if decoded_image is not None
+    ]
+    if not decoded_images:
+        return None
+    minimum_width = min(image.shape[1] for image in decoded_images)
+    heights = [
+        int(image.shape[0] * minimum_width / image.shape[1])
+        for image in decoded_images
     ]
-    concat_image = cv2.vconcat(resized_images)
+    concat_image = np.empty((sum(heights), minimum_width, 3), np.uint8)
+    offset = 0
+    for image, height in zip(decoded_images, heights):
+        end = offset + height
+        destination = concat_image[offset:end]
+        if image.shape[:2] == destination.shape[:2]:
+            destination[:] = image
+        else:
+            cv2.resize(
+                image,
+                (minimum_width, height),
+                dst=destination,
+                interpolation=interpolation,
+            )
+        offset = end
     _, concat_image_in_bytes = cv2.imencode(
         ".jpg", concat_image, [cv2.IMWRITE_JPEG_QUALITY, 50]
     )
     return concat_image_in_bytes.tobytes()
+
+
+def resize_image(image: bytes, width: int) -> bytes:
+    decoded_image = cv2.imdecode(
+        np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR
+    )
+    if decoded_image is None:
+        return None
+    if decoded_image.shape[1] > width:
+        decoded_image = cv2.resize(
+            decoded_image,
+            (
+                width,
+                max(
+                    1,
+                    int(
+                        decoded_image.shape[0] * width / decoded_image.shape[1]
+                    ),
+                ),
+            ),
+            interpolation=cv2.INTER_AREA,
+        )
+    _, resized_image_in_bytes = cv2.imencode(
+        ".jpg", decoded_image, [cv2.IMWRITE_JPEG_QUALITY, 70]
+    )
+    return resized_image_in_bytes.tobytes()
+
+
+@inject
+class ImageExecutor:
+
+    def __init__(self, settings: Settings) -> None:
+        self.workers = settings.image_workers
+        self._semaphore = asyncio.Semaphore(settings.image_queue_size)
+        self._pool: ProcessPoolExecutor = None
+
+    async def vertically_concat_images(self, images: List[bytes]) -> bytes:
+        async with self._semaphore:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return await asyncio.get_running_loop().run_in_executor(
+                self._pool, vertically_concat_images, images
+            )
+
+    def shutdown(self):
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
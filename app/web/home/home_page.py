@@ -1,15 +1,18 @@
+from math import ceil
 from flask import Blueprint, render_template, request, redirect, url_for
+from kink import inject
 from app.domains.publications import (
     search,
     ConditionsSearch,
     SearchOrderBy,
+    sortable_fields,
     DateTimeSearch,
     save as publication_save,
     FloatRangeSearch,
     IntRangeSearch,
 )
 from app.domains.models import ProposalType, PropertyType
-import base64
+from app.settings import Settings
 from datetime import datetime
 from ast import literal_eval
 
@@ -17,7 +20,8 @@ home_page = Blueprint("home", __name__, template_folder="templates")
 
 
 @home_page.route("/")
-async def index():
+@inject
+async def index(settings: Settings):
     filter = request.args
 
     conditions = ConditionsSearch()
@@ -58,7 +62,7 @@ async def index():
             )
 
     ordering_list = []
-    if filter.get("order_by"):
+    if filter.get("order_by") in sortable_fields:
         ordering_list.append(
             SearchOrderBy(
                 field=filter.get("order_by"),
@@ -66,27 +70,31 @@ async def index():
             )
         )
 
+    page_size = min(
+        max(filter.get("page_size", settings.web_page_size, type=int), 1),
+        settings.web_max_page_size,
+    )
+    page = max(filter.get("page", 1, type=int), 1)
+
     count, publications = search(
         like=filter.get("like"),
         conditions=conditions,
         ordering=ordering_list,
+        slice=((page - 1) * page_size, page * page_size),
+        projection=True,
+        include=["description"],
     )
-
-    printscreen_map = {}
-    for publication in publications:
-        publication_printscreen_encoded = base64.b64encode(
-            publication.printscreen
-        ).decode("utf-8")
-        printscreen_map[publication.url] = (
-            "data:image/jpeg;base64," + publication_printscreen_encoded
-        )
+    pages = max(ceil(count / page_size), 1)
 
     return render_template(
         "index.html",
         count=count,
         publications=publications,
-        printscreen_map=printscreen_map,
         filter=filter,
+        page=page,
+        page_size=page_size,
+        pages=pages,
+        sortable_fields=sortable_fields,
         proposal_types=[*ProposalType],
         property_types=[*PropertyType],
     )
@@ -0,0 +1,50 @@
+from pathlib import Path
+from flask import Blueprint, abort, request, send_file, url_for
+from kink import inject
+from app.domains.media import MediaStore
+from app.domains.models import PropertyPublication
+from app.settings import Settings
+
+media_page = Blueprint("media", __name__)
+
+
+@media_page.app_template_global()
+def media_url(
+    publication: PropertyPublication, key: str, size: str = None
+) -> str:
+    media_hash = getattr(publication, f"{key}_hash")
+    if media_hash:
+        return url_for("media.image", media_hash=media_hash, size=size)
+    return None
+
+
+@inject
+def send_media(path: Path, etag: str, settings: Settings):
+    if path is None or not path.exists():
+        abort(404)
+    response = send_file(
+        path,
+        mimetype="image/jpeg",
+        etag=etag,
+        last_modified=path.stat().st_mtime,
+        max_age=settings.media_max_age,
+        conditional=True,
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@media_page.route("/<media_hash>")
+@inject
+async def image(media_hash: str, media_store: MediaStore):
+    size = request.args.get("size")
+    try:
+        if size:
+            return send_media(
+                media_store.thumbnail(media_hash, size), f"{media_hash}-{size}"
+            )
+        return send_media(media_store.path(media_hash), media_hash)
+    except ValueError:
+        abort(404)
+
@@ -1,6 +1,8 @@
 from flask import Flask
+from app.domains import publications
 from app.web.home.home_page import home_page
 from app.web.detail.detail_page import detail_page
+from app.web.media.media_page import media_page
 from rich.logging import RichHandler
 import rich
 import logging
@@ -23,9 +25,12 @@ logging.basicConfig(
 
 
 def create_app():
+    publications.migrate_media()
+
     app = Flask(__name__)
 
     app.register_blueprint(home_page)
     app.register_blueprint(detail_page, url_prefix="/detail")
+    app.register_blueprint(media_page, url_prefix="/media")
 
     return app
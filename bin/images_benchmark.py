@@ -0,0 +1,104 @@
+#!.venv/bin/python
+
+import asyncio
+from time import perf_counter
+from typing import List
+
+import cv2
+import numpy as np
+import typer
+from app.utils import ImageExecutor, vertically_concat_images
+import logging
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def sample_images(count: int, seed: int = 0) -> List[bytes]:
+    random = np.random.default_rng(seed)
+    images = []
+    for index in range(count):
+        width = int(random.integers(640, 1280))
+        height = int(random.integers(480, 960))
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)
+        image = np.dstack(
+            [
+                np.tile(gradient, (height, 1)),
+                random.integers(0, 255, (height, width), dtype=np.uint8),
+                np.full((height, width), index * 16 % 256, np.uint8),
+            ]
+        )
+        _, encoded = cv2.imencode(
+            ".webp", image, [cv2.IMWRITE_WEBP_QUALITY, 80]
+        )
+        images.append(encoded.tobytes())
+    return images
+
+
+def legacy_vertically_concat_images(images: List[bytes]) -> bytes:
+    images = [np.frombuffer(image, np.uint8) for image in images]
+    images = [cv2.imdecode(image, cv2.IMREAD_COLOR) for image in images]
+    minimum_width = min(image.shape[1] for image in images)
+    resized_images = [
+        cv2.resize(
+            image,
+            (
+                minimum_width,
+                int(image.shape[0] * minimum_width / image.shape[1]),
+            ),
+            interpolation=cv2.INTER_CUBIC,
+        )
+        for image in images
+    ]
+    _, concat_image_in_bytes = cv2.imencode(
+        ".jpg", cv2.vconcat(resized_images), [cv2.IMWRITE_JPEG_QUALITY, 50]
+    )
+    return concat_image_in_bytes.tobytes()
+
+
+def main(galleries: int = 16, images_per_gallery: int = 12):
+    """
+    Benchmark gallery stitching on synthetic webp images.
+
+    * Pass `--galleries N` to set how many galleries are stitched
+
+    * Pass `--images-per-gallery N` to set the gallery size
+    """
+    image_sets = [
+        sample_images(images_per_gallery, seed) for seed in range(galleries)
+    ]
+
+    start_time = perf_counter()
+    for images in image_sets:
+        legacy_vertically_concat_images(images)
+    logger.info("Legacy stitching: %.2fs", perf_counter() - start_time)
+
+    start_time = perf_counter()
+    for images in image_sets:
+        vertically_concat_images(images)
+    logger.info("Preallocated stitching: %.2fs", perf_counter() - start_time)
+
+    async def stitch_all():
+        image_executor = ImageExecutor()
+        try:
+            await asyncio.gather(
+                *[
+                    image_executor.vertically_concat_images(images)
+                    for images in image_sets
+                ]
+            )
+        finally:
+            image_executor.shutdown()
+
+    start_time = perf_counter()
+    asyncio.run(stitch_all())
+    logger.info(
+        "Process pool stitching: %.2fs (event loop kept free)",
+        perf_counter() - start_time,
+    )
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -1,14 +1,20 @@
 #!.venv/bin/python
 
 import asyncio
-from typing import List
+from datetime import UTC, datetime
+from operator import methodcaller
+from typing import Awaitable, Callable, List
+from app.domains import publications
+from app.domains.browser import browser_session
 from app.domains.publisher import Publisher
 from kink import inject
 import logging
 import typer
 from rich.logging import RichHandler
 import rich
+from rich.table import Table
 from app.settings import Settings
+from app.utils import ImageExecutor, LogPrefixFilter, log_prefix
 
 app = typer.Typer(
     no_args_is_help=True,
@@ -18,19 +24,20 @@ app = typer.Typer(
 
 rich.get_console().set_alt_screen(False)
 rich.get_console().clear()
+log_handler = RichHandler(
+    tracebacks_show_locals=True,
+    rich_tracebacks=True,
+    tracebacks_word_wrap=True,
+    tracebacks_suppress=["logging"],
+)
+log_handler.addFilter(LogPrefixFilter())
 logging.basicConfig(
     level=logging.INFO,
     datefmt="%Y-%m-%d %H:%M:%S",
     format="%(message)s",
-    handlers=[
-        RichHandler(
-            tracebacks_show_locals=True,
-            rich_tracebacks=True,
-            tracebacks_word_wrap=True,
-            tracebacks_suppress=["logging"],
-        )
-    ],
+    handlers=[log_handler],
 )
+logger = logging.getLogger(__name__)
 
 
 @inject
@@ -54,49 +61,168 @@ def get_publishers(
     return publishers
 
 
+@inject
+def run_publishers(
+    like: str,
+    action: Callable[[Publisher], Awaitable],
+    settings: Settings,
+    image_executor: ImageExecutor,
+):
+    async def run(publisher: Publisher, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            log_prefix.set(publisher.name)
+            start_time = datetime.now(UTC)
+            try:
+                await action(publisher)
+                return publisher.name, datetime.now(UTC) - start_time, None
+            except Exception as ex:
+                logger.exception("%s process failed", publisher.name)
+                return publisher.name, datetime.now(UTC) - start_time, ex
+
+    async def inner():
+        publishers = get_publishers(like)
+        semaphore = asyncio.Semaphore(
+            settings.max_concurrent_publishers or len(publishers) or 1
+        )
+        async with browser_session():
+            results = await asyncio.gather(
+                *[run(publisher, semaphore) for publisher in publishers]
+            )
+        return results
+
+    try:
+        results = asyncio.run(inner())
+    finally:
+        image_executor.shutdown()
+
+    summary = Table(title="Publishers summary")
+    summary.add_column("Publisher")
+    summary.add_column("Elapsed time")
+    summary.add_column("Status")
+    for name, elapsed_time, ex in results:
+        summary.add_row(
+            name, str(elapsed_time), f"failed: {ex!r}" if ex else "completed"
+        )
+    rich.get_console().print(summary)
+    if any(ex for *_, ex in results):
+        raise typer.Exit(code=1)
+
+
+def update_publisher_settings(**values):
+    @inject
+    def inner(settings: Settings):
+        for key, value in values.items():
+            if value is not None:
+                setattr(settings.default_publisher_settings, key, value)
+
+    inner()
+
+
 @app.command()
-def all_process(like: str = None):
+def all_process(
+    like: str = None,
+    concurrency: int = None,
+    parallel_search: bool = None,
+    pipelined: bool = None,
+    incremental_stop_after: int = None,
+    resume: bool = None,
+    budget: int = None,
+):
     """
     Perform all detailed search processing on the publishers website.
 
     * Pass `--like patter_name` to filter publishers
-    """
 
-    async def inner():
-        for publisher in get_publishers(like):
-            await publisher.process()
+    * Pass `--concurrency N` to inspect N publication pages at once
 
-    asyncio.run(inner())
+    * Pass `--parallel-search` to run all publisher searchers at once
+
+    * Pass `--pipelined` to inspect publications found while searching
+
+    * Pass `--incremental-stop-after N` to stop searching after N known
+    publications in a row
+
+    * Pass `--resume` to continue an interrupted run from its checkpoint
+
+    * Pass `--budget N` to inspect only the N most valuable due publications
+    """
+    update_publisher_settings(
+        concurrency=concurrency,
+        parallel_search=parallel_search,
+        pipelined=pipelined,
+        incremental_stop_after=incremental_stop_after,
+        resume=resume,
+        inspection_budget=budget,
+    )
+
+    run_publishers(like, methodcaller("process"))
 
 
 @app.command()
-def search_process(like: str = None):
+def search_process(
+    like: str = None,
+    parallel_search: bool = None,
+    incremental_stop_after: int = None,
+    resume: bool = None,
+):
     """
     Perform search processing on the publishers website.
 
     * Pass `--like patter_name` to filter publishers
-    """
 
-    async def inner():
-        for publisher in get_publishers(like):
-            await publisher._search_process()
+    * Pass `--parallel-search` to run all publisher searchers at once
 
-    asyncio.run(inner())
+    * Pass `--incremental-stop-after N` to stop searching after N known
+    publications in a row
+
+    * Pass `--resume` to continue an interrupted search from its checkpoint
+    """
+    update_publisher_settings(
+        parallel_search=parallel_search,
+        incremental_stop_after=incremental_stop_after,
+        resume=resume,
+    )
+
+    run_publishers(like, methodcaller("_search_process"))
 
 
 @app.command()
-def detailed_info_process(like: str = None):
+def detailed_info_process(
+    like: str = None,
+    concurrency: int = None,
+    resume: bool = None,
+    budget: int = None,
+):
     """
     Perform publication info processing on the publishers website.
 
     * Pass `--like patter_name` to filter publishers
+
+    * Pass `--concurrency N` to inspect N publication pages at once
+
+    * Pass `--resume` to continue after the last checkpointed publication
+
+    * Pass `--budget N` to inspect only the N most valuable due publications
     """
+    update_publisher_settings(
+        concurrency=concurrency, resume=resume, inspection_budget=budget
+    )
 
-    async def inner():
-        for publisher in get_publishers(like):
-            await publisher._publications_processs()
+    run_publishers(like, methodcaller("_publications_processs"))
 
-    asyncio.run(inner())
+
+@app.command()
+def migrate_media(batch_size: int = 100, vacuum: bool = False):
+    """
+    Move picture and printscreen blobs from the database to the media store.
+
+    * Pass `--batch-size N` to move N publications per transaction
+
+    * Pass `--vacuum` to compact the SQLite database afterwards
+    """
+    publications.migrate_media(batch_size)
+    if vacuum:
+        publications.vacuum()
 
 
 @app.command()
@@ -119,6 +245,7 @@ def callback(
     log: bool = True,
     only_inspect: bool = True,
     always_download_pictures: bool = False,
+    max_publishers: int = None,
 ):
     """
     Property Finder is a scanner/searcher to helps track
@@ -130,6 +257,8 @@ def callback(
 
     * Pass `--always-download-pictures` to force the download
     of publication pictures
+
+    * Pass `--max-publishers N` to limit how many publishers run at once
     """
     if not log:
         logging.disable(logging.CRITICAL)
@@ -142,6 +271,8 @@ def callback(
             settings.default_publisher_settings.always_download_pictures = (
                 always_download_pictures
             )
+        if max_publishers:
+            settings.max_concurrent_publishers = max_publishers
 
     inner()
 
@@ -0,0 +1,29 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+import pytest
+
+test_directory = tempfile.mkdtemp()
+os.environ["DB_CONNECTION_URI"] = "sqlite:///" + os.path.join(
+    test_directory, "test.db"
+)
+os.environ["MEDIA_PATH"] = os.path.join(test_directory, "media")
+
+fixtures_path = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture
+def fixture_text():
+    def load(name: str) -> str:
+        return (fixtures_path / name).read_text(encoding="utf-8")
+
+    return load
+
+
+@pytest.fixture
+def fixture_json(fixture_text):
+    def load(name: str) -> dict:
+        return json.loads(fixture_text(name))
+
+    return load
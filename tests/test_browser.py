@@ -0,0 +1,69 @@
+import asyncio
+from time import monotonic
+from types import SimpleNamespace
+from app.domains.browser import readiness
+from app.settings import WaitSettings
+
+
+class FakePage:
+
+    def __init__(self) -> None:
+        self.listeners = {}
+
+    def on(self, event: str, listener):
+        self.listeners[event] = listener
+
+    def remove_listener(self, event: str, listener):
+        if self.listeners.get(event) is listener:
+            del self.listeners[event]
+
+    async def wait_for_event(self, event: str, predicate, timeout: float):
+        return SimpleNamespace(url="https://example.com/fit-in/1x1/a.webp")
+
+    def finish(self, url: str):
+        self.listeners["requestfinished"](SimpleNamespace(url=url))
+
+
+def test_readiness_waits_for_matching_requests_to_go_quiet():
+    page = FakePage()
+    wait = WaitSettings(response=r"/fit-in/", quiet=100, timeout=1000)
+
+    async def load_images():
+        for index in range(3):
+            await asyncio.sleep(0.05)
+            page.finish(f"https://example.com/fit-in/1x1/{index}.webp")
+            page.finish("https://example.com/tracking")
+
+    async def run() -> float:
+        async with readiness(page, wait, "pictures"):
+            images = asyncio.create_task(load_images())
+        await images
+        return monotonic()
+
+    start_time = monotonic()
+    elapsed = asyncio.run(run()) - start_time
+
+    assert 0.25 <= elapsed < 1
+    assert "requestfinished" not in page.listeners
+
+
+def test_readiness_quiet_wait_is_capped_by_timeout():
+    page = FakePage()
+    wait = WaitSettings(response=r"/fit-in/", quiet=100, timeout=300)
+
+    async def load_images():
+        while True:
+            await asyncio.sleep(0.02)
+            page.finish("https://example.com/fit-in/1x1/a.webp")
+
+    async def run() -> float:
+        images = asyncio.create_task(load_images())
+        async with readiness(page, wait, "pictures"):
+            pass
+        images.cancel()
+        return monotonic()
+
+    start_time = monotonic()
+    elapsed = asyncio.run(run()) - start_time
+
+    assert 0.3 <= elapsed < 0.6
@@ -0,0 +1,56 @@
+from hashlib import sha256
+import pytest
+from kink import di
+from sqlmodel import Session
+from app.domains import publications
+from app.domains.media import MediaStore
+from app.domains.models import PropertyPublication
+
+
+def test_put_is_content_addressed_and_sharded():
+    media_store = di[MediaStore]
+
+    media_hash = media_store.put(b"image")
+
+    assert media_hash == sha256(b"image").hexdigest()
+    assert media_store.put(b"image") == media_hash
+    assert media_store.path(media_hash).relative_to(media_store.root).parts[
+        :2
+    ] == (media_hash[:2], media_hash[2:4])
+    assert media_store.path(media_hash).read_bytes() == b"image"
+
+
+def test_path_rejects_invalid_hashes():
+    with pytest.raises(ValueError):
+        di[MediaStore].path("../settings.py")
+
+
+def test_save_replaces_blobs_with_hashes():
+    url = "https://example.com/media/save"
+
+    publications.save({"url": url, "picture": b"picture"})
+
+    publication = publications.py_url(url)
+    assert publication.picture is None
+    assert publication.picture_hash == sha256(b"picture").hexdigest()
+    assert publications.already_have_photo(url)
+
+
+def test_migrate_media_moves_legacy_blobs():
+    url = "https://example.com/media/legacy"
+    with di[Session] as session, session.begin():
+        session.add(
+            PropertyPublication(
+                url=url, picture=b"legacy", printscreen=b"legacy"
+            )
+        )
+
+    assert publications.migrate_media(batch_size=1) >= 1
+
+    publication = publications.py_url(url)
+    assert publication.picture is None
+    assert publication.printscreen is None
+    assert publication.picture_hash == publication.printscreen_hash
+    assert (
+        di[MediaStore].path(publication.picture_hash).read_bytes() == b"legacy"
+    )
@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from app.domains import publications
+from app.settings import Settings
+
+
+@pytest.fixture(scope="module", autouse=True)
+def searchable_publications():
+    publications.save_all(
+        [
+            {
+                "url": "https://example.com/search/1",
+                "publisher": "search",
+                "description": "Apartamento com varanda gourmet",
+                "address": "Rua São João",
+            },
+            {
+                "url": "https://example.com/search/2",
+                "publisher": "search",
+                "description": "Casa térrea",
+                "details": "apartamento apartamento apartamento",
+            },
+        ]
+    )
+
+
+def search_urls(like: str) -> list:
+    _, results = publications.search(
+        like=like, conditions=publications.ConditionsSearch(publisher="search")
+    )
+    return [publication.url for publication in results]
+
+
+def test_search_with_empty_like_returns_everything():
+    count, _ = publications.search(like="")
+
+    assert count == publications.search()[0]
+
+
+def test_search_matches_prefixes_without_accents():
+    assert search_urls("sao joa") == ["https://example.com/search/1"]
+    assert search_urls("TERR") == ["https://example.com/search/2"]
+
+
+def test_search_ranks_full_text_matches():
+    assert search_urls("apartamento") == [
+        "https://example.com/search/2",
+        "https://example.com/search/1",
+    ]
+
+
+def test_search_without_words_falls_back_to_like():
+    assert search_urls("!!") == []
+
+
+def test_save_all_inserts_and_updates():
+    url = "https://example.com/save_all/upsert"
+
+    publications.save_all([{"url": url, "bedrooms": 2, "buy_price": 100.0}])
+    publications.save_all([{"url": url, "buy_price": 90.0}])
+
+    publication = publications.py_url(url)
+    assert publication.bedrooms == 2
+    assert publication.buy_price == 90.0
+
+
+def test_save_all_never_overwrites_with_none():
+    url = "https://example.com/save_all/none"
+
+    publications.save_all([{"url": url, "address": "Rua X"}])
+    publications.save_all([{"url": url, "address": None, "bedrooms": 3}])
+
+    publication = publications.py_url(url)
+    assert publication.address == "Rua X"
+    assert publication.bedrooms == 3
+
+
+def buffer(size: int = 50, interval: float = 60, **kwargs):
+    return publications.PublicationsBuffer(
+        settings=Settings(
+            db_write_batch_size=size, db_write_flush_interval=interval
+        ),
+        **kwargs,
+    )
+
+
+def test_buffer_flushes_at_batch_size_and_on_exit():
+    urls = [f"https://example.com/buffer/{index}" for index in range(3)]
+    flushed = []
+
+    async def run():
+        async def on_flush(items):
+            flushed.append([item["url"] for item in items])
+
+        async with buffer(size=2, on_flush=on_flush) as publications_buffer:
+            for url in urls:
+                await publications_buffer.add({"url": url})
+
+    asyncio.run(run())
+
+    assert flushed == [urls[:2], urls[2:]]
+    assert all(publications.py_url(url) for url in urls)
+
+
+def test_buffer_keeps_items_when_periodic_flush_fails(monkeypatch):
+    urls = [f"https://example.com/buffer/retry/{index}" for index in range(2)]
+    save_all = publications.save_all
+    failures = []
+
+    def failing_save_all(items):
+        if not failures:
+            failures.append(items)
+            raise RuntimeError("database is locked")
+        save_all(items)
+
+    monkeypatch.setattr(publications, "save_all", failing_save_all)
+
+    async def run():
+        async with buffer(interval=0.01) as publications_buffer:
+            for url in urls:
+                await publications_buffer.add({"url": url})
+            while not failures:
+                await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+
+    assert all(publications.py_url(url) for url in urls)
@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime
+from kink import di
+from app.domains.publisher import zap_imoveis as zap_imoveis_module
+from app.domains.publisher.zap_imoveis import ZapImoveis
+
+
+def run_workers(publisher, publication_urls, workers: int = 2):
+    async def urls():
+        for publication_url in publication_urls:
+            await asyncio.sleep(0)
+            if callable(publication_url):
+                publication_url = publication_url()
+            yield publication_url
+
+    async def run():
+        queue = asyncio.Queue(maxsize=workers)
+        pending, failed, deferred = set(), set(), set()
+        async with asyncio.TaskGroup() as task_group:
+            for _ in range(workers):
+                task_group.create_task(
+                    publisher._publications_worker(
+                        queue, pending, failed, deferred
+                    )
+                )
+            task_group.create_task(
+                publisher._publications_producer(
+                    urls(), queue, pending, failed, deferred, workers
+                )
+            )
+        return failed
+
+    return asyncio.run(asyncio.wait_for(run(), 5))
+
+
+def test_pending_duplicate_is_retried_after_a_failed_attempt(monkeypatch):
+    publisher = di[ZapImoveis]
+    attempts = []
+
+    async def inspect_publication(publication_url: str) -> bool:
+        attempts.append(publication_url)
+        await asyncio.sleep(0.05)
+        return len(attempts) > 1
+
+    monkeypatch.setattr(publisher, "_inspect_publication", inspect_publication)
+
+    failed = run_workers(publisher, ["slow", "slow"])
+
+    assert attempts == ["slow", "slow"]
+    assert failed == set()
+
+
+def test_pending_duplicate_does_not_block_the_producer(monkeypatch):
+    publisher = di[ZapImoveis]
+    attempts = []
+
+    async def inspect_publication(publication_url: str) -> bool:
+        attempts.append(publication_url)
+        if publication_url == "slow":
+            while len(attempts) < 3:
+                await asyncio.sleep(0.01)
+        return True
+
+    monkeypatch.setattr(publisher, "_inspect_publication", inspect_publication)
+
+    run_workers(publisher, ["slow", "slow", "a", "b"])
+
+    assert attempts == ["slow", "a", "b"]
+
+
+def test_seen_url_releases_its_checkpoint_cursor(monkeypatch):
+    publisher = di[ZapImoveis]
+    checkpoints = []
+    monkeypatch.setattr(publisher, "_unfinished_cursors", {})
+    monkeypatch.setattr(publisher, "_inspected_urls", set())
+    monkeypatch.setattr(
+        zap_imoveis_module.crawl_state,
+        "save",
+        lambda *args, **kwargs: checkpoints.append(kwargs["cursor_url"]),
+    )
+
+    async def inspect_publication(publication_url: str) -> bool:
+        return True
+
+    monkeypatch.setattr(publisher, "_inspect_publication", inspect_publication)
+
+    def cursor(publication_url: str):
+        def register() -> str:
+            publisher._unfinished_cursors[publication_url] = (
+                datetime(2026, 1, 1),
+                publication_url,
+            )
+            return publication_url
+
+        return register
+
+    run_workers(
+        publisher, ["x", cursor("x"), cursor("y"), cursor("z")], workers=1
+    )
+
+    assert checkpoints[-1] == "z"
+    assert publisher._unfinished_cursors == {}
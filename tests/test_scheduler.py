@@ -0,0 +1,51 @@
+from kink import di
+from sqlmodel import Session
+from app.domains import publications
+from app.domains.models import InspectionSchedule
+
+
+def schedule(url: str) -> InspectionSchedule:
+    with di[Session] as session:
+        return session.get(InspectionSchedule, url)
+
+
+def test_unchanged_listing_is_not_volatile():
+    url = "https://example.com/scheduler/unchanged"
+    card = {
+        "url": url,
+        "publisher": "scheduler",
+        "address": "Bairro, Cidade",
+        "details": "Apartamento para comprar",
+        "bedrooms": 2,
+        "buy_price": 500000.0,
+    }
+    page = {
+        **card,
+        "address": "Rua X, 100 - Bairro, Cidade - SP",
+        "description": "Apartamento com varanda",
+        "to_inspect": False,
+    }
+
+    for _ in range(3):
+        publications.save_all([card])
+        assert not schedule(url).card_changed
+        publications.save(page)
+
+    assert schedule(url).change_count == 0
+    assert schedule(url).inspected_at is not None
+
+
+def test_card_price_change_is_tracked():
+    url = "https://example.com/scheduler/changed"
+    card = {"url": url, "publisher": "scheduler", "buy_price": 500000.0}
+
+    publications.save_all([card])
+    publications.save_all([{**card, "buy_price": 450000.0}])
+
+    assert schedule(url).card_changed
+    assert schedule(url).change_count == 1
+
+    publications.save({**card, "buy_price": 450000.0, "to_inspect": False})
+
+    assert not schedule(url).card_changed
+    assert schedule(url).change_count == 1
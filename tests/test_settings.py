@@ -0,0 +1,25 @@
+from app.settings import PublisherSettings
+
+
+def test_waits_and_routing_merge_over_defaults(tmp_path, monkeypatch):
+    (tmp_path / "config").mkdir()
+    (tmp_path / "config" / "default.yaml").write_text(
+        "waits:\n"
+        "  search_results:\n"
+        "    selector: a[itemprop=url]\n"
+        "    timeout: 2000\n"
+        "routing:\n"
+        "  inspect_publication_page:\n"
+        "    blocked_resource_types: [font]\n"
+    )
+    monkeypatch.chdir(tmp_path)
+
+    publisher_settings = PublisherSettings()
+
+    assert publisher_settings.waits["search_results"].timeout == 2000
+    assert publisher_settings.waits["search_results_next_page"].response
+    assert publisher_settings.waits["publication_pictures"].quiet == 300
+    assert publisher_settings.routing[
+        "inspect_publication_page"
+    ].blocked_resource_types == ["font"]
+    assert publisher_settings.routing["inspect_search_results_page"]
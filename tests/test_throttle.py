@@ -0,0 +1,90 @@
+import asyncio
+from app.domains import throttle
+from app.domains.throttle import AdaptiveController
+from app.settings import ThrottleSettings
+
+
+def controller(**kwargs) -> AdaptiveController:
+    return AdaptiveController(
+        ThrottleSettings(enabled=True, min_delay=0, delay_step=0.5, **kwargs),
+        concurrency=1,
+    )
+
+
+def test_adjust_increases_additively_and_backs_off_multiplicatively():
+    adaptive_controller = controller(max_concurrency=4, backoff=0.5)
+
+    for _ in range(10):
+        adaptive_controller._adjust(congested=False)
+
+    assert adaptive_controller.limit == 4
+    assert adaptive_controller.delay == 0
+
+    adaptive_controller._adjust(congested=True)
+
+    assert adaptive_controller.limit == 2
+    assert adaptive_controller.delay == 0.5
+
+    for _ in range(5):
+        adaptive_controller._adjust(congested=True)
+
+    assert adaptive_controller.limit == 1
+
+
+def test_max_concurrency_defaults_to_concurrency():
+    adaptive_controller = AdaptiveController(
+        ThrottleSettings(enabled=True), concurrency=3
+    )
+
+    assert adaptive_controller.max_concurrency == 3
+    assert adaptive_controller.limit == 1
+
+
+def test_slot_gates_in_flight_requests_by_limit():
+    adaptive_controller = controller(max_concurrency=2)
+    adaptive_controller.limit = 2
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with adaptive_controller.slot():
+            peak = max(peak, adaptive_controller.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*[request() for _ in range(6)])
+
+    asyncio.run(run())
+
+    assert peak == 2
+    assert adaptive_controller.in_flight == 0
+
+
+def test_slot_backs_off_on_reported_congestion():
+    adaptive_controller = controller(max_concurrency=4)
+    adaptive_controller.limit = 4
+
+    async def run():
+        async with adaptive_controller.slot():
+            throttle.report(status=429)
+
+    asyncio.run(run())
+
+    assert adaptive_controller.limit == 2
+    assert adaptive_controller.delay == 0.5
+
+
+def test_slot_backs_off_on_reported_latency_only():
+    adaptive_controller = controller(max_concurrency=4, latency_target=0.05)
+    adaptive_controller.limit = 4
+
+    async def run(latency: float):
+        async with adaptive_controller.slot():
+            throttle.report(latency=latency)
+            await asyncio.sleep(0.1)
+
+    asyncio.run(run(0.01))
+    assert adaptive_controller.limit == 4
+
+    asyncio.run(run(0.2))
+    assert adaptive_controller.limit == 2
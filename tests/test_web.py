@@ -0,0 +1,77 @@
+import pytest
+from kink import di
+from sqlmodel import Session
+from app.domains import publications
+from app.domains.media import MediaStore
+from app.domains.models import PropertyPublication
+from app.settings import Settings
+from app.web.startup import create_app
+
+
+@pytest.fixture
+def client():
+    return create_app().test_client()
+
+
+def test_startup_moves_legacy_blobs_into_store():
+    url = "https://example.com/web/legacy"
+    with di[Session] as session, session.begin():
+        session.add(PropertyPublication(url=url, printscreen=b"printscreen"))
+
+    client = create_app().test_client()
+
+    publication = publications.py_url(url)
+    assert publication.printscreen is None
+    assert (
+        client.get(f"/media/{publication.printscreen_hash}").data
+        == b"printscreen"
+    )
+
+
+def test_media_route_with_relative_media_path(client, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    media_store = MediaStore(settings=Settings(media_path="media"))
+    default_media_store = di[MediaStore]
+    di[MediaStore] = media_store
+    try:
+        media_hash = media_store.put(b"relative")
+        response = client.get(f"/media/{media_hash}")
+    finally:
+        di[MediaStore] = default_media_store
+
+    assert media_store.root == tmp_path / "media"
+    assert response.status_code == 200
+    assert response.data == b"relative"
+
+
+def test_pages_skip_missing_images(client):
+    url = "https://example.com/web/no-image"
+    publications.save({"url": url, "description": "No image"})
+
+    detail = client.get("/detail/", query_string={"url": url})
+    home = client.get("/", query_string={"like": "", "page_size": "100"})
+
+    assert detail.status_code == 200
+    assert b"<img" not in detail.data
+    assert home.status_code == 200
+    assert b'src="None"' not in home.data
+
+
+@pytest.mark.parametrize(
+    "query_string",
+    [
+        {"page": "abc"},
+        {"page_size": "abc"},
+        {"page": "", "page_size": ""},
+        {"page": "-3", "page_size": "0"},
+    ],
+)
+def test_home_falls_back_on_invalid_pagination(client, query_string):
+    response = client.get("/", query_string=query_string)
+
+    assert response.status_code == 200
+    assert b"Page 1 of" in response.data
+
+
+def test_home_with_empty_like(client):
+    assert client.get("/", query_string={"like": ""}).status_code == 200
@@ -0,0 +1,343 @@
+import asyncio
+from datetime import datetime
+import pytest
+from kink import di
+from app.domains import publications
+from app.domains.browser import FetchedPage
+from app.domains.throttle import AdaptiveController
+from app.domains.models import PropertyPublication, PropertyType, ProposalType
+from app.domains.publisher import zap_imoveis as zap_imoveis_module
+from app.domains.publisher.zap_imoveis import (
+    ListingPageMapper,
+    ListingResultMapper,
+    ListingState,
+    ScriptsParser,
+    ZapImoveis,
+    _iter_dicts,
+)
+from app.settings import ThrottleSettings
+
+publication_url = (
+    "https://www.zapimoveis.com.br/imovel/venda-apartamento-2-quartos-"
+    "paraiso-sao-paulo-sp-68m2-id-2601234567/"
+)
+
+
+def is_listing_result(item: dict) -> bool:
+    return "listing" in item and "link" in item
+
+
+class FakeResponse:
+
+    def __init__(self, url: str, data: dict) -> None:
+        self.url = url
+        self._data = data
+
+    async def json(self) -> dict:
+        return self._data
+
+
+def test_iter_dicts_finds_nested_listing_results(fixture_json):
+    results = list(
+        _iter_dicts(fixture_json("zap_listings_api.json"), is_listing_result)
+    )
+
+    assert [result["listing"]["id"] for result in results] == [
+        "2601234567",
+        "2609876543",
+    ]
+
+
+def test_iter_dicts_does_not_descend_into_matches():
+    data = {"listing": {"listing": {}, "link": {}}, "link": {}}
+
+    assert list(_iter_dicts(data, is_listing_result)) == [data]
+
+
+def test_listing_result_mapper_sale(fixture_json):
+    result, _ = _iter_dicts(
+        fixture_json("zap_listings_api.json"), is_listing_result
+    )
+
+    publication = asyncio.run(
+        ListingResultMapper(result, ZapImoveis.website).get_dict(
+            PropertyPublication
+        )
+    )
+
+    assert publication["url"] == publication_url
+    assert publication["proposal"] == ProposalType.SELL
+    assert publication["type"] == PropertyType.APTO
+    assert publication["address"] == (
+        "Rua Vergueiro, 1000 - Paraíso, São Paulo - SP"
+    )
+    assert publication["square_meter"] == 68
+    assert publication["bedrooms"] == 2
+    assert publication["bathrooms"] == 1
+    assert publication["car_spaces"] == 1
+    assert publication["buy_price"] == 650000
+    assert publication["rent_price"] is None
+    assert publication["condominium_fee"] == 850
+    assert publication["iptu_tax"] == 1200
+    assert publication["publication_created_at"] == datetime(
+        2024, 5, 2, 13, 45, 10
+    )
+    assert publication["printscreen"] is None
+
+
+def test_listing_result_mapper_rent(fixture_json):
+    _, result = _iter_dicts(
+        fixture_json("zap_listings_api.json"), is_listing_result
+    )
+
+    publication = asyncio.run(
+        ListingResultMapper(result, ZapImoveis.website).get_dict(
+            PropertyPublication
+        )
+    )
+
+    assert publication["proposal"] == ProposalType.RENT
+    assert publication["type"] == PropertyType.HOUSE
+    assert publication["address"] == "Vila Mariana, São Paulo - SP"
+    assert publication["rent_price"] == 4500
+    assert publication["buy_price"] is None
+    assert publication["condominium_fee"] is None
+    assert publication["car_spaces"] is None
+
+
+def test_capture_listings_keys_by_url_path(fixture_json):
+    zap_imoveis = di[ZapImoveis]
+    page = object()
+    url = "https://glue-api.zapimoveis.com.br/v2/listings?page=1"
+
+    asyncio.run(
+        zap_imoveis._capture_listings(
+            page, FakeResponse(url, fixture_json("zap_listings_api.json"))
+        )
+    )
+    captured = zap_imoveis._captured_listings.pop(page)
+
+    assert sorted(captured) == [
+        "/imovel/aluguel-casa-3-quartos-vila-mariana-sao-paulo-sp-120m2"
+        "-id-2609876543/",
+        "/imovel/venda-apartamento-2-quartos-paraiso-sao-paulo-sp-68m2"
+        "-id-2601234567/",
+    ]
+
+
+def test_capture_listings_ignores_other_responses(fixture_json):
+    zap_imoveis = di[ZapImoveis]
+    page = object()
+
+    asyncio.run(
+        zap_imoveis._capture_listings(
+            page,
+            FakeResponse(
+                "https://www.zapimoveis.com.br/api/other",
+                fixture_json("zap_listings_api.json"),
+            ),
+        )
+    )
+
+    assert page not in zap_imoveis._captured_listings
+
+
+@pytest.fixture
+def known_publication():
+    publications.save(
+        {"url": publication_url, "to_inspect": True, "picture": b"picture"}
+    )
+    yield publication_url
+    publications.save(
+        {"url": publication_url, "to_inspect": True, "deleted": False}
+    )
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    pages = {}
+
+    async def fetch(url: str) -> FetchedPage:
+        return pages[url]
+
+    monkeypatch.setattr(zap_imoveis_module, "fetch", fetch)
+    return pages
+
+
+def test_scripts_parser_reads_embedded_state(fixture_text):
+    script_texts = ScriptsParser.parse(
+        fixture_text("zap_publication_page.html")
+    )
+
+    assert len(script_texts) == 3
+    assert "window.dataLayer" in script_texts[0]
+    listing_state = ListingState(script_texts)
+    assert listing_state.listing["id"] == "2601234567"
+    assert listing_state.broker() == "Imobiliária Paraíso"
+
+
+def test_listing_page_mapper(fixture_text):
+    listing_state = ListingState(
+        ScriptsParser.parse(fixture_text("zap_publication_page.html"))
+    )
+
+    publication = asyncio.run(
+        ListingPageMapper(listing_state, publication_url).get_dict(
+            PropertyPublication
+        )
+    )
+
+    assert publication["url"] == publication_url
+    assert publication["description"] == (
+        "Apartamento com 2 Quartos à venda, 68m²"
+    )
+    assert publication["details"] == (
+        "Apartamento reformado, próximo ao metrô."
+    )
+    assert publication["broker"] == "Imobiliária Paraíso"
+    assert publication["floor"] == 7
+    assert publication["buy_price"] == 650000
+    assert publication["publication_updated_at"] == datetime(
+        2024, 6, 11, 8, 1, 2
+    )
+
+
+def test_inspect_publication_http_saves_embedded_state(
+    known_publication, fetched, fixture_text
+):
+    fetched[known_publication] = FetchedPage(
+        url=known_publication,
+        status=200,
+        text=fixture_text("zap_publication_page.html"),
+    )
+
+    assert asyncio.run(
+        di[ZapImoveis].inspect_publication_http(known_publication)
+    )
+
+    publication = publications.py_url(known_publication)
+    assert publication.to_inspect is False
+    assert publication.deleted is False
+    assert publication.broker == "Imobiliária Paraíso"
+    assert publication.buy_price == 650000
+
+
+def test_inspect_publication_http_falls_back_on_bot_protection(
+    known_publication, fetched, fixture_text
+):
+    fetched[known_publication] = FetchedPage(
+        url=known_publication,
+        status=200,
+        text=fixture_text("zap_bot_challenge.html"),
+    )
+
+    assert not asyncio.run(
+        di[ZapImoveis].inspect_publication_http(known_publication)
+    )
+    assert publications.py_url(known_publication).to_inspect is True
+
+
+def test_inspect_publication_http_marks_not_found_as_deleted(
+    known_publication, fetched
+):
+    fetched[known_publication] = FetchedPage(
+        url="https://www.zapimoveis.com.br/404/", status=404, text=""
+    )
+
+    assert asyncio.run(
+        di[ZapImoveis].inspect_publication_http(known_publication)
+    )
+
+    publication = publications.py_url(known_publication)
+    assert publication.deleted is True
+    assert publication.to_inspect is False
+
+
+def test_inspect_publication_http_needs_a_known_picture(fetched):
+    assert not asyncio.run(
+        di[ZapImoveis].inspect_publication_http(
+            "https://www.zapimoveis.com.br/imovel/unknown-id-1/"
+        )
+    )
+
+
+def test_checkpoint_stops_at_oldest_unfinished_publication(monkeypatch):
+    zap_imoveis = di[ZapImoveis]
+    cursors = [
+        (
+            datetime(2026, 1, 3 - index),
+            f"https://example.com/checkpoint/{index}",
+        )
+        for index in range(3)
+    ]
+    checkpoints = []
+    monkeypatch.setattr(
+        zap_imoveis,
+        "_unfinished_cursors",
+        {cursor[1]: cursor for cursor in cursors},
+    )
+    monkeypatch.setattr(zap_imoveis, "_inspected_urls", set())
+    monkeypatch.setattr(
+        zap_imoveis_module.crawl_state,
+        "save",
+        lambda *args, **kwargs: checkpoints.append(kwargs["cursor_url"]),
+    )
+
+    async def inspected(index: int):
+        await zap_imoveis.publication_inspected(cursors[index][1])
+
+    asyncio.run(inspected(1))
+    assert checkpoints == []
+
+    asyncio.run(inspected(0))
+    assert checkpoints == [cursors[1][1]]
+
+    asyncio.run(inspected(2))
+    assert checkpoints == [cursors[1][1], cursors[2][1]]
+
+
+class FakeLocator:
+
+    first = property(lambda self: self)
+
+    async def wait_for(self, **kwargs):
+        pass
+
+    async def count(self) -> int:
+        return 0
+
+
+class FakePage:
+
+    def __init__(self, url: str, html: str) -> None:
+        self.url = url
+        self._html = html
+
+    def locator(self, selector: str) -> FakeLocator:
+        return FakeLocator()
+
+    async def content(self) -> str:
+        return self._html
+
+
+def test_inspect_publication_page_reports_bot_protection(
+    known_publication, fixture_text
+):
+    adaptive_controller = AdaptiveController(
+        ThrottleSettings(enabled=True, max_concurrency=4), concurrency=1
+    )
+    adaptive_controller.limit = 4
+
+    async def inspect():
+        async with adaptive_controller.slot():
+            await di[ZapImoveis].inspect_publication_page(
+                FakePage(
+                    known_publication, fixture_text("zap_bot_challenge.html")
+                ),
+                known_publication,
+            )
+
+    asyncio.run(inspect())
+
+    assert adaptive_controller.limit == 2
+    assert publications.py_url(known_publication).to_inspect is True